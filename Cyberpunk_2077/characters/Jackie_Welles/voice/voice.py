@@ -1,8 +1,11 @@
 import subprocess
 
+# Edge voice of the character, also read by functions/tts_engine.py
+VOICE = 'en-US-EricNeural'
+
 
 def create_speech(text, path):
-    voice = 'en-US-EricNeural'
+    voice = VOICE
     # Define the command and arguments
     command = ["edge-tts", "--voice", voice,
                "--text", text, "--write-media", path]
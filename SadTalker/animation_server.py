@@ -0,0 +1,194 @@
+import torch
+import uuid
+import numpy as np
+import os, sys, shutil
+from argparse import ArgumentParser
+from multiprocessing.connection import Listener
+
+from src.utils.preprocess import CropAndExtract
+from src.test_audio2coeff import Audio2Coeff
+from src.facerender.animate import AnimateFromCoeff
+from src.generate_batch import get_data
+from src.generate_facerender_batch import get_facerender_data
+
+
+def encode_image(image):
+    # images cross the socket as raw bytes with shape and dtype, numpy pickles are not portable
+    # between the numpy pinned here and the one of the client
+    image = np.ascontiguousarray(image)
+    return {'data': image.tobytes(), 'shape': image.shape, 'dtype': image.dtype.str}
+
+
+def decode_image(encoded):
+    return np.frombuffer(encoded['data'], dtype=encoded['dtype']).reshape(encoded['shape']).copy()
+
+
+class AnimationServer():
+
+    def __init__(self, checkpoint_dir, device, preprocess='full'):
+
+        current_code_path = sys.argv[0]
+        current_root_path = os.path.split(current_code_path)[0]
+
+        os.environ['TORCH_HOME']=os.path.join(current_root_path, checkpoint_dir)
+
+        path_of_lm_croper = os.path.join(current_root_path, checkpoint_dir, 'shape_predictor_68_face_landmarks.dat')
+        path_of_net_recon_model = os.path.join(current_root_path, checkpoint_dir, 'epoch_20.pth')
+        dir_of_BFM_fitting = os.path.join(current_root_path, checkpoint_dir, 'BFM_Fitting')
+        wav2lip_checkpoint = os.path.join(current_root_path, checkpoint_dir, 'wav2lip.pth')
+
+        audio2pose_checkpoint = os.path.join(current_root_path, checkpoint_dir, 'auido2pose_00140-model.pth')
+        audio2pose_yaml_path = os.path.join(current_root_path, 'src', 'config', 'auido2pose.yaml')
+
+        audio2exp_checkpoint = os.path.join(current_root_path, checkpoint_dir, 'auido2exp_00300-model.pth')
+        audio2exp_yaml_path = os.path.join(current_root_path, 'src', 'config', 'auido2exp.yaml')
+
+        free_view_checkpoint = os.path.join(current_root_path, checkpoint_dir, 'facevid2vid_00189-model.pth.tar')
+
+        if preprocess == 'full':
+            mapping_checkpoint = os.path.join(current_root_path, checkpoint_dir, 'mapping_00109-model.pth.tar')
+            facerender_yaml_path = os.path.join(current_root_path, 'src', 'config', 'facerender_still.yaml')
+        else:
+            mapping_checkpoint = os.path.join(current_root_path, checkpoint_dir, 'mapping_00229-model.pth.tar')
+            facerender_yaml_path = os.path.join(current_root_path, 'src', 'config', 'facerender.yaml')
+
+        #init model once, every job reuses them
+        print(path_of_net_recon_model)
+        self.preprocess_model = CropAndExtract(path_of_lm_croper, path_of_net_recon_model, dir_of_BFM_fitting, device)
+
+        print(audio2pose_checkpoint)
+        print(audio2exp_checkpoint)
+        self.audio_to_coeff = Audio2Coeff(audio2pose_checkpoint, audio2pose_yaml_path,
+                                    audio2exp_checkpoint, audio2exp_yaml_path,
+                                    wav2lip_checkpoint, device)
+
+        print(free_view_checkpoint)
+        print(mapping_checkpoint)
+        self.animate_from_coeff = AnimateFromCoeff(free_view_checkpoint, mapping_checkpoint,
+                                                facerender_yaml_path, device)
+
+        self.preprocess = preprocess
+        self.device = device
+
+    def prepare(self, source_image, driven_audio, result_dir, still=True, pose_style=0, batch_size=2, expression_scale=1.):
+
+        save_dir = os.path.join(result_dir, str(uuid.uuid4()))
+        os.makedirs(save_dir, exist_ok=True)
+
+        #crop image and extract 3dmm from image
+        first_frame_dir = os.path.join(save_dir, 'first_frame_dir')
+        os.makedirs(first_frame_dir, exist_ok=True)
+        first_coeff_path, crop_pic_path, crop_info =  self.preprocess_model.generate(source_image, first_frame_dir, self.preprocess, source_image_flag=True)
+        if first_coeff_path is None:
+            raise AttributeError("Can't get the coeffs of the input")
+
+        #audio2ceoff
+        batch = get_data(first_coeff_path, driven_audio, self.device, None, still=still)
+        coeff_path = self.audio_to_coeff.generate(batch, save_dir, pose_style)
+
+        #coeff2video
+        data = get_facerender_data(coeff_path, crop_pic_path, first_coeff_path, driven_audio,
+                                    batch_size, expression_scale=expression_scale, still_mode=still, preprocess=self.preprocess)
+
+        return data, crop_info, save_dir
+
+    def generate(self, source_image, driven_audio, result_dir, still=True, enhancer=None, background_enhancer=None,
+                 pose_style=0, batch_size=2, expression_scale=1.):
+
+        try:
+            data, crop_info, save_dir = self.prepare(source_image, driven_audio, result_dir, still=still, pose_style=pose_style,
+                                                     batch_size=batch_size, expression_scale=expression_scale)
+
+            return_path = self.animate_from_coeff.generate(data, save_dir, source_image, crop_info, \
+                                        enhancer=enhancer, background_enhancer=background_enhancer, preprocess=self.preprocess)
+        finally:
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+        return return_path
+
+    def generate_stream(self, source_image, driven_audio, result_dir, still=True, enhancer=None, background_enhancer=None,
+                        pose_style=0, batch_size=2, expression_scale=1., chunk_size=8):
+
+        try:
+            data, crop_info, save_dir = self.prepare(source_image, driven_audio, result_dir, still=still, pose_style=pose_style,
+                                                     batch_size=batch_size, expression_scale=expression_scale)
+
+            try:
+                for frames in self.animate_from_coeff.generate_stream(data, source_image, crop_info, enhancer=enhancer,
+                                                    background_enhancer=background_enhancer, preprocess=self.preprocess, chunk_size=chunk_size):
+                    yield frames
+            finally:
+                # nothing is kept for streamed jobs, the frames have already been sent
+                shutil.rmtree(save_dir, ignore_errors=True)
+        finally:
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+
+def serve(server, address, authkey):
+    listener = Listener(address, authkey=authkey)
+    print(f'Animation server listening on {address[0]}:{address[1]}')
+
+    while True:
+        conn = listener.accept()
+        try:
+            job = conn.recv()
+            if job['command'] == 'shutdown':
+                conn.send({'status': 'ok'})
+                break
+            elif job['command'] == 'ping':
+                conn.send({'status': 'ok'})
+            elif job['command'] == 'generate':
+                try:
+                    job['args']['source_image'] = decode_image(job['args']['source_image'])
+                    video_path = server.generate(**job['args'])
+                    conn.send({'status': 'ok', 'video_path': video_path})
+                except Exception as e:
+                    print(f'Animation job failed: {e}')
+                    conn.send({'status': 'error', 'error': str(e)})
+            elif job['command'] == 'generate_stream':
+                # frames are sent chunk by chunk while the rest of the clip renders
+                try:
+                    job['args']['source_image'] = decode_image(job['args']['source_image'])
+                    for frames in server.generate_stream(**job['args']):
+                        conn.send({'status': 'frames', 'frames': [encode_image(frame) for frame in frames]})
+                    conn.send({'status': 'ok'})
+                except (BrokenPipeError, ConnectionResetError):
+                    print('Animation stream closed by the client')
+                except Exception as e:
+                    print(f'Animation job failed: {e}')
+                    conn.send({'status': 'error', 'error': str(e)})
+            else:
+                conn.send({'status': 'error', 'error': f"Unknown command {job['command']}"})
+        except EOFError:
+            pass
+        finally:
+            conn.close()
+
+    listener.close()
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser()
+    parser.add_argument("--host", default='localhost', help="address the server listens on")
+    parser.add_argument("--port", type=int, default=6150, help="port the server listens on")
+    parser.add_argument("--checkpoint_dir", default='./checkpoints', help="path to the model checkpoints")
+    parser.add_argument("--preprocess", default='full', choices=['crop', 'resize', 'full'], help="how to preprocess the images" )
+    parser.add_argument("--cpu", dest="cpu", action="store_true")
+
+    args = parser.parse_args()
+
+    # jobs are pickles, only clients that know the key may connect, there is no default so it cannot be guessed
+    authkey = os.environ.get('SADTALKER_AUTHKEY')
+    if not authkey:
+        parser.error("set SADTALKER_AUTHKEY to the hex shared secret of the clients")
+
+    if torch.cuda.is_available() and not args.cpu:
+        device = "cuda"
+    else:
+        device = "cpu"
+
+    server = AnimationServer(args.checkpoint_dir, device, preprocess=args.preprocess)
+    serve(server, (args.host, args.port), bytes.fromhex(authkey))
@@ -0,0 +1,82 @@
+import time
+import yaml
+import torch
+from argparse import ArgumentParser
+
+from src.facerender.modules.keypoint_detector import HEEstimator, KPDetector
+from src.facerender.modules.mapping import MappingNet
+from src.facerender.modules.generator import OcclusionAwareSPADEGenerator
+from src.facerender.modules.make_animation import make_animation, keypoint_transformation, render_memory_budget_mb
+
+
+def make_animation_uncached(source_image, source_semantics, target_semantics, generator, kp_detector, mapping):
+    # The renderer before the source encoding was split out, the encoder runs again for every frame
+    with torch.no_grad():
+        predictions = []
+        kp_canonical = kp_detector(source_image)
+        kp_source = keypoint_transformation(kp_canonical, mapping(source_semantics))
+        for frame_idx in range(target_semantics.shape[1]):
+            kp_driving = keypoint_transformation(kp_canonical, mapping(target_semantics[:, frame_idx]))
+            out = generator(source_image, kp_source=kp_source, kp_driving=kp_driving)
+            predictions.append(out['prediction'])
+        return torch.stack(predictions, dim=1)
+
+
+def main(args):
+    torch.manual_seed(0)
+    torch.set_num_threads(args.threads)
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+
+    # Random weights, the cost of a frame does not depend on the checkpoint
+    generator = OcclusionAwareSPADEGenerator(**config['model_params']['generator_params'],
+                                             **config['model_params']['common_params']).eval()
+    kp_extractor = KPDetector(**config['model_params']['kp_detector_params'],
+                              **config['model_params']['common_params']).eval()
+    he_estimator = HEEstimator(**config['model_params']['he_estimator_params'],
+                               **config['model_params']['common_params']).eval()
+    mapping = MappingNet(**config['model_params']['mapping_params']).eval()
+
+    coeff_nc = config['model_params']['mapping_params']['coeff_nc']
+    source_image = torch.rand(args.batch_size, 3, args.size, args.size)
+    source_semantics = torch.rand(args.batch_size, coeff_nc, 27)
+    target_semantics = torch.rand(args.batch_size, args.frames, coeff_nc, 27)
+    frame_count = args.batch_size * args.frames
+
+    # Warm up so the first timed run does not pay for the allocations
+    make_animation(source_image, source_semantics, target_semantics[:, :1],
+                   generator, kp_extractor, he_estimator, mapping)
+
+    start_time = time.perf_counter()
+    uncached = make_animation_uncached(source_image, source_semantics, target_semantics,
+                                       generator, kp_extractor, mapping)
+    uncached_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    cached = make_animation(source_image, source_semantics, target_semantics,
+                            generator, kp_extractor, he_estimator, mapping, batch_frames=1)
+    cached_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    batched = make_animation(source_image, source_semantics, target_semantics,
+                             generator, kp_extractor, he_estimator, mapping, memory_budget_mb=args.memory_budget_mb)
+    batched_time = time.perf_counter() - start_time
+
+    print(f"Encoder every frame: {frame_count / uncached_time:.2f} fps ({uncached_time:.2f}s for {frame_count} frames)")
+    print(f"Encoder once per clip: {frame_count / cached_time:.2f} fps ({cached_time:.2f}s for {frame_count} frames)")
+    print(f"Frames batched in {args.memory_budget_mb}MB: {frame_count / batched_time:.2f} fps ({batched_time:.2f}s for {frame_count} frames)")
+    print(f"Speedup: {uncached_time / cached_time:.2f}x cached, {uncached_time / batched_time:.2f}x batched, "
+          f"max difference: {(uncached - cached).abs().max().item():.2e} cached, {(uncached - batched).abs().max().item():.2e} batched")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Frames per second of the face renderer on CPU")
+    parser.add_argument("--config", default='./src/config/facerender.yaml')
+    parser.add_argument("--frames", type=int, default=16, help="frames per batch item")
+    parser.add_argument("--batch_size", type=int, default=2)
+    parser.add_argument("--size", type=int, default=256, help="source image size, 256 or 512")
+    parser.add_argument("--memory_budget_mb", type=int, default=render_memory_budget_mb)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+    main(args)
@@ -4,11 +4,14 @@ from torch import nn
 
 
 class Audio2Exp(nn.Module):
-    def __init__(self, netG, cfg, device, prepare_training_loss=False):
+    def __init__(self, netG, cfg, device, prepare_training_loss=False, chunk_size=256):
         super(Audio2Exp, self).__init__()
         self.cfg = cfg
         self.device = device
         self.netG = netG.to(device)
+        # frames sent through netG at once, 0 for the whole sequence in a single pass.
+        # netG works on every frame independently, so this only trades memory for fewer calls
+        self.chunk_size = chunk_size
 
     def test(self, batch):
 
@@ -16,15 +19,17 @@ class Audio2Exp(nn.Module):
         bs = mel_input.shape[0]
         T = mel_input.shape[1]
 
+        chunk_size = max(1, self.chunk_size or T)
+
         exp_coeff_pred = []
 
-        for i in tqdm(range(0, T, 10),'audio2exp:'): # every 10 frames
+        for i in tqdm(range(0, T, chunk_size),'audio2exp:'): # every chunk_size frames
             
-            current_mel_input = mel_input[:,i:i+10]
+            current_mel_input = mel_input[:,i:i+chunk_size]
 
             #ref = batch['ref'][:, :, :64].repeat((1,current_mel_input.shape[1],1))           #bs T 64
-            ref = batch['ref'][:, :, :64][:, i:i+10]
-            ratio = batch['ratio_gt'][:, i:i+10]                               #bs T
+            ref = batch['ref'][:, :, :64][:, i:i+chunk_size]
+            ratio = batch['ratio_gt'][:, i:i+chunk_size]                               #bs T
 
             audiox = current_mel_input.view(-1, 1, 80, 16)                  # bs*T 1 80 16
 
@@ -16,11 +16,11 @@ import torchvision
 from src.facerender.modules.keypoint_detector import HEEstimator, KPDetector
 from src.facerender.modules.mapping import MappingNet
 from src.facerender.modules.generator import OcclusionAwareGenerator, OcclusionAwareSPADEGenerator
-from src.facerender.modules.make_animation import make_animation 
+from src.facerender.modules.make_animation import make_animation, make_animation_stream
 
 from pydub import AudioSegment 
 from src.utils.face_enhancer import enhancer as face_enhancer
-from src.utils.paste_pic import paste_pic
+from src.utils.paste_pic import paste_pic, paste_frame
 from src.utils.videoio import save_video_with_watermark
 
 
@@ -217,3 +217,46 @@ class AnimateFromCoeff():
 
         return return_path
 
+    def generate_stream(self, x, pic_path, crop_info, enhancer=None, background_enhancer=None, preprocess='crop', chunk_size=8):
+        # yields lists of BGR frames as soon as each chunk is rendered, instead of encoding a video at the end
+
+        source_image=x['source_image'].type(torch.FloatTensor).to(self.device)
+        source_semantics=x['source_semantics'].type(torch.FloatTensor).to(self.device)
+        target_semantics=x['target_semantics_list'].type(torch.FloatTensor).to(self.device)
+        yaw_c_seq = x['yaw_c_seq'].type(torch.FloatTensor).to(self.device) if 'yaw_c_seq' in x else None
+        pitch_c_seq = x['pitch_c_seq'].type(torch.FloatTensor).to(self.device) if 'pitch_c_seq' in x else None
+        roll_c_seq = x['roll_c_seq'].type(torch.FloatTensor).to(self.device) if 'roll_c_seq' in x else None
+
+        frame_num = x['frame_num']
+        original_size = crop_info[0]
+
+        paste = preprocess.lower() == 'full'
+        if paste and len(crop_info) != 3:
+            # same as paste_pic, there is no crop box to paste the frames back into
+            print("you didn't crop the image")
+            paste = False
+        if paste:
+            full_img = pic_path if isinstance(pic_path, np.ndarray) else cv2.imread(pic_path)
+
+        for predictions in make_animation_stream(source_image, source_semantics, target_semantics,
+                                        self.generator, self.kp_extractor, self.he_estimator, self.mapping,
+                                        yaw_c_seq, pitch_c_seq, roll_c_seq, use_exp = True,
+                                        frame_num=frame_num, chunk_size=chunk_size):
+
+            result = img_as_ubyte(np.transpose(predictions.data.cpu().numpy(), [0, 2, 3, 1]).astype(np.float32))
+
+            ### the generated video is 256x256, so we  keep the aspect ratio,
+            frames = []
+            for result_i in result:
+                if original_size:
+                    result_i = cv2.resize(result_i,(256, int(256.0 * original_size[1]/original_size[0]) ))
+                frame = cv2.cvtColor(result_i, cv2.COLOR_RGB2BGR)
+                if paste:
+                    frame = paste_frame(frame, full_img, crop_info)
+                frames.append(frame)
+
+            if enhancer:
+                enhanced_images = face_enhancer([cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames], method=enhancer, bg_upsampler=background_enhancer)
+                frames = [cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) for frame in enhanced_images]
+
+            yield frames
@@ -207,8 +207,8 @@ class OcclusionAwareSPADEGenerator(nn.Module):
             deformation = deformation.permute(0, 2, 3, 4, 1)
         return F.grid_sample(inp, deformation)
 
-    def forward(self, source_image, kp_driving, kp_source):
-        # Encoding (downsampling) part
+    def encode_source(self, source_image):
+        # Encoding (downsampling) part, it only depends on the source image so it can be reused for every frame
         out = self.first(source_image)
         for i in range(len(self.down_blocks)):
             out = self.down_blocks[i](out)
@@ -217,6 +217,16 @@ class OcclusionAwareSPADEGenerator(nn.Module):
         # print(out.shape)
         feature_3d = out.view(bs, self.reshape_channel, self.reshape_depth, h ,w) 
         feature_3d = self.resblocks_3d(feature_3d)
+        return {'feature_2d': out, 'feature_3d': feature_3d}
+
+    def forward(self, source_image, kp_driving, kp_source, source_features=None):
+        if source_features is None:
+            source_features = self.encode_source(source_image)
+        return self.forward_with_features(source_features, kp_driving, kp_source)
+
+    def forward_with_features(self, source_features, kp_driving, kp_source):
+        out = source_features['feature_2d']
+        feature_3d = source_features['feature_3d']
 
         # Transforming feature representation according to deformation and occlusion
         output_dict = {}
@@ -99,45 +99,114 @@ def keypoint_transformation(kp_canonical, he, wo_exp=False):
 
 
 
+# Memory the activations of one batched renderer pass may take, in MB. Consecutive frames are rendered
+# together until this is reached, larger batches make better use of the BLAS threads on CPU
+render_memory_budget_mb = 2048
+
+# Activations of one frame relative to the size of the encoded source, estimated from the dense motion
+# network and the decoder at the 256px config
+activation_factor = 32
+
+def frames_per_batch(source_features, memory_budget_mb=None):
+    # frames of each clip rendered in one pass, so that all clips together stay within the budget
+    if memory_budget_mb is None:
+        memory_budget_mb = render_memory_budget_mb
+    feature_3d = source_features['feature_3d']
+    bytes_per_frame = feature_3d.numel() * feature_3d.element_size() * activation_factor
+    return max(1, int(memory_budget_mb * 1024 * 1024 // bytes_per_frame))
+
+def repeat_frames(tensors, n):
+    # every frame of a clip shares the keypoints and features of its source image
+    return {k: v.repeat_interleave(n, dim=0) if v is not None else None for k, v in tensors.items()}
+
+def render_frames(generator, mapping, source_features, kp_canonical, kp_source, target_semantics,
+                            yaw_c_seq=None, pitch_c_seq=None, roll_c_seq=None):
+    # renders n consecutive frames of each of the bs clips in one pass,
+    # target_semantics is (bs, n, coeff_nc, win) and the pose sequences are (bs, n)
+    bs, n = target_semantics.shape[:2]
+    he_driving = mapping(target_semantics.reshape((bs * n,) + target_semantics.shape[2:]))
+    if yaw_c_seq is not None:
+        he_driving['yaw_in'] = yaw_c_seq.reshape(-1)
+    if pitch_c_seq is not None:
+        he_driving['pitch_in'] = pitch_c_seq.reshape(-1)
+    if roll_c_seq is not None:
+        he_driving['roll_in'] = roll_c_seq.reshape(-1)
+
+    kp_driving = keypoint_transformation(repeat_frames(kp_canonical, n), he_driving)
+    out = generator.forward_with_features(repeat_frames(source_features, n),
+                                          kp_source=repeat_frames(kp_source, n), kp_driving=kp_driving)
+    prediction = out['prediction']
+    return prediction.view((bs, n) + prediction.shape[1:])
+
 def make_animation(source_image, source_semantics, target_semantics,
                             generator, kp_detector, he_estimator, mapping, 
                             yaw_c_seq=None, pitch_c_seq=None, roll_c_seq=None,
-                            use_exp=True):
+                            use_exp=True, batch_frames=None, memory_budget_mb=None):
     with torch.no_grad():
-        predictions = []
+        predictions_ts = None
 
         kp_canonical = kp_detector(source_image)
         he_source = mapping(source_semantics)
         kp_source = keypoint_transformation(kp_canonical, he_source)
-    
-        for frame_idx in tqdm(range(target_semantics.shape[1]), 'Face Renderer:'):
-            target_semantics_frame = target_semantics[:, frame_idx]
-            he_driving = mapping(target_semantics_frame)
-            if yaw_c_seq is not None:
-                he_driving['yaw_in'] = yaw_c_seq[:, frame_idx]
-            if pitch_c_seq is not None:
-                he_driving['pitch_in'] = pitch_c_seq[:, frame_idx] 
-            if roll_c_seq is not None:
-                he_driving['roll_in'] = roll_c_seq[:, frame_idx] 
-            
-            kp_driving = keypoint_transformation(kp_canonical, he_driving)
-                
-            #kp_norm = normalize_kp(kp_source=kp_source, kp_driving=kp_driving,
-                                   #kp_driving_initial=kp_driving_initial)
-            kp_norm = kp_driving
-            out = generator(source_image, kp_source=kp_source, kp_driving=kp_norm)
-            '''
-            source_image_new = out['prediction'].squeeze(1)
-            kp_canonical_new =  kp_detector(source_image_new)
-            he_source_new = he_estimator(source_image_new) 
-            kp_source_new = keypoint_transformation(kp_canonical_new, he_source_new, wo_exp=True)
-            kp_driving_new = keypoint_transformation(kp_canonical_new, he_driving, wo_exp=True)
-            out = generator(source_image_new, kp_source=kp_source_new, kp_driving=kp_driving_new)
-            '''
-            predictions.append(out['prediction'])
-        predictions_ts = torch.stack(predictions, dim=1)
+
+        # The source image is the same for every frame, encode it once
+        source_features = generator.encode_source(source_image)
+        if batch_frames is None:
+            batch_frames = frames_per_batch(source_features, memory_budget_mb)
+
+        frame_count = target_semantics.shape[1]
+        for start in tqdm(range(0, frame_count, batch_frames), 'Face Renderer:'):
+            end = min(start + batch_frames, frame_count)
+            prediction = render_frames(generator, mapping, source_features, kp_canonical, kp_source,
+                                       target_semantics[:, start:end],
+                                       yaw_c_seq[:, start:end] if yaw_c_seq is not None else None,
+                                       pitch_c_seq[:, start:end] if pitch_c_seq is not None else None,
+                                       roll_c_seq[:, start:end] if roll_c_seq is not None else None)
+            if predictions_ts is None:
+                predictions_ts = prediction.new_empty((prediction.shape[0], frame_count) + prediction.shape[2:])
+            predictions_ts[:, start:end] = prediction
     return predictions_ts
 
+def make_animation_stream(source_image, source_semantics, target_semantics,
+                            generator, kp_detector, he_estimator, mapping,
+                            yaw_c_seq=None, pitch_c_seq=None, roll_c_seq=None,
+                            use_exp=True, frame_num=None, chunk_size=8, memory_budget_mb=None):
+    # the batch axis of target_semantics is a reshaped time axis, flatten it back so frames come out in playback order
+    target_semantics = target_semantics.reshape((1, -1)+target_semantics.shape[2:])
+    if yaw_c_seq is not None:
+        yaw_c_seq = yaw_c_seq.reshape(1, -1)
+    if pitch_c_seq is not None:
+        pitch_c_seq = pitch_c_seq.reshape(1, -1)
+    if roll_c_seq is not None:
+        roll_c_seq = roll_c_seq.reshape(1, -1)
+    if frame_num is None:
+        frame_num = target_semantics.shape[1]
+
+    with torch.no_grad():
+        source_image = source_image[:1]
+        kp_canonical = kp_detector(source_image)
+        he_source = mapping(source_semantics[:1])
+        kp_source = keypoint_transformation(kp_canonical, he_source)
+        source_features = generator.encode_source(source_image)
+
+        # a chunk is yielded as soon as it is complete, larger chunks are rendered in several passes
+        batch_frames = min(chunk_size, frames_per_batch(source_features, memory_budget_mb))
+
+        for chunk_start in range(0, frame_num, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, frame_num)
+            predictions = None
+            for start in range(chunk_start, chunk_end, batch_frames):
+                end = min(start + batch_frames, chunk_end)
+                prediction = render_frames(generator, mapping, source_features, kp_canonical, kp_source,
+                                           target_semantics[:, start:end],
+                                           yaw_c_seq[:, start:end] if yaw_c_seq is not None else None,
+                                           pitch_c_seq[:, start:end] if pitch_c_seq is not None else None,
+                                           roll_c_seq[:, start:end] if roll_c_seq is not None else None)[0]
+                if predictions is None:
+                    predictions = prediction.new_empty((chunk_end - chunk_start,) + prediction.shape[1:])
+                predictions[start - chunk_start:end - chunk_start] = prediction
+            yield predictions
+
 class AnimateModel(torch.nn.Module):
     """
     Merge all generator related updates into single model for better multi-gpu usage
@@ -1,12 +1,17 @@
 import os
+import hashlib
+from collections import OrderedDict
 
-from tqdm import tqdm
 import torch
 import numpy as np
 import random
 import scipy.io as scio
 import src.utils.audio as audio
 
+# audio content hash -> (mel spectrogram, num_frames), least recently used first
+mel_cache = OrderedDict()
+mel_cache_size = 16
+
 def crop_pad_audio(wav, audio_length):
     if len(wav) > audio_length:
         wav = wav[:audio_length]
@@ -48,6 +53,25 @@ def generate_blink_seq_randomly(num_frames):
             break
     return ratio
 
+def load_mel(audio_path, fps=25):
+    with open(audio_path, 'rb') as f:
+        cache_key = (hashlib.sha1(f.read()).hexdigest(), fps)
+    if cache_key in mel_cache:
+        # same audio as an earlier line, skip loading and the stft
+        mel_cache.move_to_end(cache_key)
+        return mel_cache[cache_key]
+
+    wav = audio.load_wav(audio_path, 16000) 
+    wav_length, num_frames = parse_audio_length(len(wav), 16000, fps)
+    wav = crop_pad_audio(wav, wav_length)
+    orig_mel = audio.melspectrogram(wav).T         # nframes 80
+
+    if mel_cache_size > 0:
+        mel_cache[cache_key] = (orig_mel, num_frames)
+        if len(mel_cache) > mel_cache_size:
+            mel_cache.popitem(last=False)
+    return orig_mel, num_frames
+
 def get_data(first_coeff_path, audio_path, device, ref_eyeblink_coeff_path, still=False):
 
     syncnet_mel_step_size = 16
@@ -56,22 +80,14 @@ def get_data(first_coeff_path, audio_path, device, ref_eyeblink_coeff_path, stil
     pic_name = os.path.splitext(os.path.split(first_coeff_path)[-1])[0]
     audio_name = os.path.splitext(os.path.split(audio_path)[-1])[0]
 
-    wav = audio.load_wav(audio_path, 16000) 
-    wav_length, num_frames = parse_audio_length(len(wav), 16000, 25)
-    wav = crop_pad_audio(wav, wav_length)
-    orig_mel = audio.melspectrogram(wav).T
-    spec = orig_mel.copy()         # nframes 80
-    indiv_mels = []
-
-    for i in tqdm(range(num_frames), 'mel:'):
-        start_frame_num = i-2
-        start_idx = int(80. * (start_frame_num / float(fps)))
-        end_idx = start_idx + syncnet_mel_step_size
-        seq = list(range(start_idx, end_idx))
-        seq = [ min(max(item, 0), orig_mel.shape[0]-1) for item in seq ]
-        m = spec[seq, :]
-        indiv_mels.append(m.T)
-    indiv_mels = np.asarray(indiv_mels)         # T 80 16
+    orig_mel, num_frames = load_mel(audio_path, fps)         # nframes 80
+
+    # window of every frame starts 2 frames early, indices past either end repeat the edge row
+    start_frame_num = np.arange(num_frames) - 2
+    start_idx = (80. * (start_frame_num / float(fps))).astype(int)
+    seq = start_idx[:, None] + np.arange(syncnet_mel_step_size)
+    seq = np.clip(seq, 0, orig_mel.shape[0]-1)
+    indiv_mels = orig_mel[seq].transpose(0, 2, 1)         # T 80 16
 
     ratio = generate_blink_seq_randomly(num_frames)      # T
     source_semantics_path = first_coeff_path
@@ -1,5 +1,6 @@
 import os
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from PIL import Image
 from skimage import io, img_as_float32, transform
 import torch
@@ -7,7 +8,7 @@ import scipy.io as scio
 
 def get_facerender_data(coeff_path, pic_path, first_coeff_path, audio_path, 
                         batch_size, input_yaw_list=None, input_pitch_list=None, input_roll_list=None, 
-                        expression_scale=1.0, still_mode = False, preprocess='crop'):
+                        expression_scale=1.0, still_mode = False, preprocess='crop', debug_dump=False):
 
     semantic_radius = 13
     video_name = os.path.splitext(os.path.split(coeff_path)[-1])[0]
@@ -47,26 +48,25 @@ def get_facerender_data(coeff_path, pic_path, first_coeff_path, audio_path,
     if still_mode:
         generated_3dmm[:, 64:] = np.repeat(source_semantics[:, 64:], generated_3dmm.shape[0], axis=0)
 
-    with open(txt_path+'.txt', 'w') as f:
-        for coeff in generated_3dmm:
-            for i in coeff:
-                f.write(str(i)[:7]   + '  '+'\t')
-            f.write('\n')
+    if debug_dump:
+        with open(txt_path+'.txt', 'w') as f:
+            for coeff in generated_3dmm:
+                for i in coeff:
+                    f.write(str(i)[:7]   + '  '+'\t')
+                f.write('\n')
 
-    target_semantics_list = [] 
     frame_num = generated_3dmm.shape[0]
     data['frame_num'] = frame_num
-    for frame_idx in range(frame_num):
-        target_semantics = transform_semantic_target(generated_3dmm, frame_idx, semantic_radius)
-        target_semantics_list.append(target_semantics)
+
+    # the window of every frame at once, same as transform_semantic_target, frames past either end repeat the edge frame
+    padded_3dmm = np.pad(generated_3dmm, ((semantic_radius, semantic_radius), (0, 0)), mode='edge')
+    target_semantics_np = sliding_window_view(padded_3dmm, semantic_radius*2+1, axis=0)             #frame_num 70 semantic_radius*2+1
 
     remainder = frame_num%batch_size
     if remainder!=0:
-        for _ in range(batch_size-remainder):
-            target_semantics_list.append(target_semantics)
+        target_semantics_np = np.concatenate([target_semantics_np, np.repeat(target_semantics_np[-1:], batch_size-remainder, axis=0)])
 
-    target_semantics_np = np.array(target_semantics_list)             #frame_num 70 semantic_radius*2+1
-    target_semantics_np = target_semantics_np.reshape(batch_size, -1, target_semantics_np.shape[-2], target_semantics_np.shape[-1])
+    target_semantics_np = np.ascontiguousarray(target_semantics_np).reshape(batch_size, -1, target_semantics_np.shape[-2], target_semantics_np.shape[-1])
     data['target_semantics_list'] = torch.FloatTensor(target_semantics_np)
     data['video_name'] = video_name
     data['audio_path'] = audio_path
@@ -22,7 +22,7 @@ class Audio2Coeff():
 
     def __init__(self, audio2pose_checkpoint, audio2pose_yaml_path, 
                         audio2exp_checkpoint, audio2exp_yaml_path, 
-                        wav2lip_checkpoint, device):
+                        wav2lip_checkpoint, device, exp_chunk_size=256):
         #load config
         fcfg_pose = open(audio2pose_yaml_path)
         cfg_pose = CN.load_cfg(fcfg_pose)
@@ -52,7 +52,7 @@ class Audio2Coeff():
             load_cpk(audio2exp_checkpoint, model=netG, device=device)
         except:
             raise Exception("Failed in loading audio2exp_checkpoint")
-        self.audio2exp_model = Audio2Exp(netG, cfg_exp, device=device, prepare_training_loss=False)
+        self.audio2exp_model = Audio2Exp(netG, cfg_exp, device=device, prepare_training_loss=False, chunk_size=exp_chunk_size)
         self.audio2exp_model = self.audio2exp_model.to(device)
         for param in self.audio2exp_model.parameters():
             param.requires_grad = False
@@ -10,12 +10,41 @@ from src.utils.videoio import load_video_to_cv2
 import cv2
 
 
+# restorers are kept alive between calls, loading GFPGAN is slower than enhancing a short clip
+restorers = {}
+
 
 def enhancer(images, method='gfpgan', bg_upsampler='realesrgan'):
     print('face enhancer....')
-    if os.path.isfile(images): # handle video to images
+    if isinstance(images, str) and os.path.isfile(images): # handle video to images
         images = load_video_to_cv2(images)
 
+    restorer_key = (method, bg_upsampler)
+    if restorer_key not in restorers:
+        restorers[restorer_key] = load_restorer(method, bg_upsampler)
+    restorer = restorers[restorer_key]
+
+    # ------------------------ restore ------------------------
+    restored_img = [] 
+    for idx in tqdm(range(len(images)), 'Face Enhancer:'):
+        
+        img = cv2.cvtColor(images[idx], cv2.COLOR_RGB2BGR)
+        
+        # restore faces and background if necessary
+        cropped_faces, restored_faces, r_img = restorer.enhance(
+            img,
+            has_aligned=False,
+            only_center_face=False,
+            paste_back=True)
+        
+        r_img = cv2.cvtColor(r_img, cv2.COLOR_BGR2RGB)
+        
+        restored_img += [r_img]
+       
+    return restored_img
+
+
+def load_restorer(method='gfpgan', bg_upsampler='realesrgan'):
     # ------------------------ set up GFPGAN restorer ------------------------
     if  method == 'gfpgan':
         arch = 'clean'
@@ -75,21 +104,4 @@ def enhancer(images, method='gfpgan', bg_upsampler='realesrgan'):
         channel_multiplier=channel_multiplier,
         bg_upsampler=bg_upsampler)
 
-    # ------------------------ restore ------------------------
-    restored_img = [] 
-    for idx in tqdm(range(len(images)), 'Face Enhancer:'):
-        
-        img = cv2.cvtColor(images[idx], cv2.COLOR_RGB2BGR)
-        
-        # restore faces and background if necessary
-        cropped_faces, restored_faces, r_img = restorer.enhance(
-            img,
-            has_aligned=False,
-            only_center_face=False,
-            paste_back=True)
-        
-        r_img = cv2.cvtColor(r_img, cv2.COLOR_BGR2RGB)
-        
-        restored_img += [r_img]
-       
-    return restored_img
+    return restorer
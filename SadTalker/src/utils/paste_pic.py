@@ -7,7 +7,10 @@ from src.utils.videoio import save_video_with_watermark
 
 def paste_pic(video_path, pic_path, crop_info, new_audio_path, full_video_path):
 
-    if not os.path.isfile(pic_path):
+    if isinstance(pic_path, np.ndarray):
+        # the full image was handed over in memory
+        full_img = pic_path
+    elif not os.path.isfile(pic_path):
         raise ValueError('pic_path must be a valid path to video/image file')
     elif pic_path.split('.')[-1] in ['jpg', 'png', 'jpeg']:
         # loader for first frame
@@ -40,27 +43,25 @@ def paste_pic(video_path, pic_path, crop_info, new_audio_path, full_video_path):
     if len(crop_info) != 3:
         print("you didn't crop the image")
         return
-    else:
-        r_w, r_h = crop_info[0]
-        clx, cly, crx, cry = crop_info[1]
-        lx, ly, rx, ry = crop_info[2]
-        lx, ly, rx, ry = int(lx), int(ly), int(rx), int(ry)
-        # oy1, oy2, ox1, ox2 = cly+ly, cly+ry, clx+lx, clx+rx
-        # oy1, oy2, ox1, ox2 = cly+ly, cly+ry, clx+lx, clx+rx
-        oy1, oy2, ox1, ox2 = cly, cry, clx, crx
-
 
     tmp_path = str(uuid.uuid4())+'.mp4'
     out_tmp = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'MP4V'), fps, (frame_w, frame_h))
     for crop_frame in tqdm(crop_frames, 'seamlessClone:'):
-        p = cv2.resize(crop_frame.astype(np.uint8), (crx-clx, cry - cly)) 
-
-        mask = 255*np.ones(p.shape, p.dtype)
-        location = ((ox1+ox2) // 2, (oy1+oy2) // 2)
-        gen_img = cv2.seamlessClone(p, full_img, mask, location, cv2.NORMAL_CLONE)
+        gen_img = paste_frame(crop_frame, full_img, crop_info)
         out_tmp.write(gen_img)
 
     out_tmp.release()
 
     save_video_with_watermark(tmp_path, new_audio_path, full_video_path, watermark=False)
     os.remove(tmp_path)
+
+
+def paste_frame(crop_frame, full_img, crop_info):
+    clx, cly, crx, cry = crop_info[1]
+    oy1, oy2, ox1, ox2 = cly, cry, clx, crx
+
+    p = cv2.resize(crop_frame.astype(np.uint8), (crx-clx, cry - cly)) 
+
+    mask = 255*np.ones(p.shape, p.dtype)
+    location = ((ox1+ox2) // 2, (oy1+oy2) // 2)
+    return cv2.seamlessClone(p, full_img, mask, location, cv2.NORMAL_CLONE)
@@ -1,5 +1,6 @@
 import numpy as np
-import cv2, os, sys, torch
+import cv2, os, sys, torch, hashlib
+from collections import OrderedDict
 from tqdm import tqdm
 from PIL import Image 
 
@@ -46,7 +47,7 @@ def split_coeff(coeffs):
 
 
 class CropAndExtract():
-    def __init__(self, path_of_lm_croper, path_of_net_recon_model, dir_of_BFM_fitting, device):
+    def __init__(self, path_of_lm_croper, path_of_net_recon_model, dir_of_BFM_fitting, device, cache_size=16):
 
         self.croper = Croper(path_of_lm_croper)
         self.kp_extractor = KeypointExtractor(device)
@@ -56,20 +57,51 @@ class CropAndExtract():
         self.net_recon.eval()
         self.lm3d_std = load_lm3d(dir_of_BFM_fitting)
         self.device = device
+
+        # source image hash + preprocess mode -> coeffs, cropped image and crop info, least recently used first
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
     
     def generate(self, input_path, save_dir, crop_or_resize='crop', source_image_flag=False):
 
         pic_size = 256
-        pic_name = os.path.splitext(os.path.split(input_path)[-1])[0]  
+        # input_path may also be a BGR image array handed over in memory
+        is_array = isinstance(input_path, np.ndarray)
+        if is_array:
+            pic_name = 'source_image'
+        else:
+            pic_name = os.path.splitext(os.path.split(input_path)[-1])[0]  
 
         landmarks_path =  os.path.join(save_dir, pic_name+'_landmarks.txt') 
         coeff_path =  os.path.join(save_dir, pic_name+'.mat')  
         png_path =  os.path.join(save_dir, pic_name+'.png')  
 
         #load input
-        if not os.path.isfile(input_path):
+        if not is_array and not os.path.isfile(input_path):
             raise ValueError('input_path must be a valid path to video/image file')
-        elif input_path.split('.')[-1] in ['jpg', 'png', 'jpeg']:
+
+        is_image = is_array or input_path.split('.')[-1] in ['jpg', 'png', 'jpeg']
+        if is_image and self.cache_size > 0:
+            if is_array:
+                image_hash = hashlib.sha1(np.ascontiguousarray(input_path).tobytes())
+                image_hash.update(str(input_path.shape).encode())
+            else:
+                with open(input_path, 'rb') as f:
+                    image_hash = hashlib.sha1(f.read())
+            cache_key = (image_hash.hexdigest(), crop_or_resize.lower())
+            if cache_key in self.cache:
+                # same source image as an earlier job, skip cropping, landmarks and 3dmm extraction
+                print(' Using cached 3DMM coefficients.')
+                self.cache.move_to_end(cache_key)
+                coeff_dict, png, crop_info = self.cache[cache_key]
+                cv2.imwrite(png_path, png)
+                savemat(coeff_path, coeff_dict)
+                return coeff_path, png_path, crop_info
+
+        if is_array:
+            full_frames = [input_path]
+            fps = 25
+        elif is_image:
             # loader for first frame
             full_frames = [cv2.imread(input_path)]
             fps = 25
@@ -165,4 +197,12 @@ class CropAndExtract():
 
             savemat(coeff_path, {'coeff_3dmm': semantic_npy, 'full_3dmm': np.array(full_coeffs)[0]})
 
+        if is_image and self.cache_size > 0:
+            coeff_dict = loadmat(coeff_path)
+            coeff_dict = {'coeff_3dmm': coeff_dict['coeff_3dmm'], 'full_3dmm': coeff_dict['full_3dmm']}
+            png = cv2.cvtColor(np.array(frames_pil[0]), cv2.COLOR_RGB2BGR)
+            self.cache[cache_key] = (coeff_dict, png, crop_info)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
         return coeff_path, png_path, crop_info
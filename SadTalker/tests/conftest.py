@@ -0,0 +1,4 @@
+import os, sys
+
+# the tests import the src package the same way inference.py does, from the SadTalker root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
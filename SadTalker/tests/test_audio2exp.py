@@ -0,0 +1,38 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('tqdm')
+
+from src.audio2exp_models.networks import SimpleWrapperV2
+from src.audio2exp_models.audio2exp import Audio2Exp
+
+
+def make_batch(bs, T):
+    return {'indiv_mels': torch.randn(bs, T, 1, 80, 16),
+            'ref': torch.randn(bs, T, 70),
+            'ratio_gt': torch.rand(bs, T, 1)}
+
+
+@pytest.mark.parametrize('bs, T', [(1, 37), (2, 10), (1, 1)])
+def test_chunk_size_does_not_change_coefficients(bs, T):
+    torch.manual_seed(0)
+    netG = SimpleWrapperV2()
+    # non-trivial running statistics, so batch norm would show it if frames influenced each other
+    for module in netG.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.5, 0.5)
+            module.running_var.uniform_(0.5, 1.5)
+    netG.eval()
+    model = Audio2Exp(netG, None, device='cpu').eval()
+    batch = make_batch(bs, T)
+
+    results = {}
+    with torch.no_grad():
+        for chunk_size in [10, 256, 0]:
+            model.chunk_size = chunk_size
+            results[chunk_size] = model.test(batch)['exp_coeff_pred']
+
+    # the old loop went through netG 10 frames at a time
+    assert results[10].shape == (bs, T, 64)
+    assert torch.allclose(results[256], results[10], atol=1e-5)
+    assert torch.allclose(results[0], results[10], atol=1e-5)
@@ -1,85 +1,70 @@
-import os
-import subprocess
-from langchain.llms import Cohere
-from langchain import PromptTemplate, LLMChain
-import json
-import random
+from functions.prompt_context_cache import read_text, get_prompt, get_chain
+from functions.client_registry import call_llm
+from functions.tts_engine import get_engine
+from functions.dialogue_pipeline import speak_streaming
 from functions.pre_conversation_loader import pre_conversation_loader
 from functions.conversation_loader import conversation_loader
-from functions.get_public_data import get_public_data
-from functions.get_character_data import get_character_data
-
-
-def audio_generate_side_character(transcribed_text, player_name, game_name, character_name, emotion):
-    pre_conversation_string = pre_conversation_loader(
-        game_name, character_name)
-    conversation_string = conversation_loader(
-        transcribed_text, player_name, game_name, character_name)
-    bio_string = open(
-        f"{game_name}/characters/{character_name}/bio.txt").read()
-    world_string = open(f"{game_name}/world.txt").read()
-    public_data_string = get_public_data(game_name, character_name)
-    character_data_string = get_character_data(game_name, character_name)
-
-    # Randomly select an API key
-    selected_key = json.load(open('apikeys.json', 'r'))['api_keys'][random.randint(
-        0, len(json.load(open('apikeys.json', 'r'))['api_keys'])-1)]
-
-    # Initialise model
-    llm = Cohere(cohere_api_key=selected_key,
-                 model='command', temperature=0.9, max_tokens=300, stop=[f'{player_name}:'])
+from functions.conversation_store import append_line
+from functions.retrieval_service import retrieve_context
+from functions.stage_scheduler import run_stages, print_stage_report
+
+
+def audio_generate_side_character(transcribed_text, player_name, game_name, character_name, emotion, streaming=False):
+    # The vector store lookups only need the saved conversation, they share one query embedding
+    results, timings, critical_path, critical_path_time = run_stages({
+        'pre_conversation': (lambda: pre_conversation_loader(game_name, character_name), []),
+        'conversation': (lambda: conversation_loader(transcribed_text, player_name, game_name, character_name), []),
+        'retrieval': (lambda _: retrieve_context(game_name, character_name), ['conversation']),
+    })
+    print_stage_report(timings, critical_path, critical_path_time)
+    pre_conversation_string = results['pre_conversation']
+    conversation_string = results['conversation']
+    public_data_string, character_data_string, retrieval_timings = results['retrieval']
+    print("Retrieval: " + ", ".join(f"{name} {duration:.2f}s" for name, duration in retrieval_timings.items()))
+    bio_string = read_text(
+        f"{game_name}/characters/{character_name}/bio.txt")
+    world_string = read_text(f"{game_name}/world.txt")
 
     # Create the template string
     template = """About {game_name}\n{world_string}\n\nAbout {character_name}\n{bio_string}\n{character_name}'s Talking Style\n{pre_conversation_string}\n\nAdditional Information\n{public_data_string}\n{character_data_string}\n\n{character_name} and {player_name}(Current Emotion: {emotion}) are talking now\n{conversation_string}{character_name}:"""
 
     # Create prompt
-    prompt = PromptTemplate(template=template, input_variables=['game_name', 'world_string', 'character_name',
-                            'bio_string', 'pre_conversation_string', 'public_data_string', 'character_data_string', 'conversation_string', 'player_name', 'emotion'])
+    prompt = get_prompt(template, ['game_name', 'world_string', 'character_name',
+                        'bio_string', 'pre_conversation_string', 'public_data_string', 'character_data_string', 'conversation_string', 'player_name', 'emotion'])
 
     # print(prompt.format(game_name=game_name, world_string=world_string, character_name=character_name.replace("_", " "), bio_string=bio_string,
     #                     pre_conversation_string=pre_conversation_string, public_data_string=public_data_string, character_data_string=character_data_string, conversation_string=conversation_string, player_name=player_name, emotion=emotion))
-    # Create and run the llm chain
-    llm_chain = LLMChain(prompt=prompt, llm=llm)
-    character_response = llm_chain.run(game_name=game_name, world_string=world_string, character_name=character_name.replace("_", " "), bio_string=bio_string,
-                                       pre_conversation_string=pre_conversation_string, public_data_string=public_data_string, character_data_string=character_data_string, conversation_string=conversation_string, player_name=player_name, emotion=emotion)
-
-    # print(character_response)
+    prompt_values = dict(game_name=game_name, world_string=world_string, character_name=character_name.replace("_", " "), bio_string=bio_string,
+                         pre_conversation_string=pre_conversation_string, public_data_string=public_data_string, character_data_string=character_data_string, conversation_string=conversation_string, player_name=player_name, emotion=emotion)
 
-    # Replace newline characters with empty
-    character_response = character_response.replace("\n", "")
-
-    # Load the existing conversation from conversation.json
-    with open(f'{game_name}/characters/{character_name}/conversation.json', 'r') as f:
-        conversation = json.load(f)['conversation']
-
-    # Append the new line to the conversation
-    conversation.append(
-        {'sender': character_name.replace("_", " "), 'message': character_response})
-
-    # Save the updated conversation back to conversation.json
-    with open(f'{game_name}/characters/{character_name}/conversation.json', 'w') as f:
-        json.dump({'conversation': conversation}, f)
+    # Set path to save audio path
+    audio_path = 'temp/audio.wav'
 
-    # Set path to the the character's voice.py
-    voice_script_path = f'{game_name}.characters.{character_name}.voice.voice'
+    # Load the character's voice, the engine is loaded once per voice
+    tts_engine = get_engine(game_name, character_name)
 
-    # Set path to save audio path
-    audio_path = 'temp/audio.mp3'
+    if streaming:
+        # Synthesize every sentence as soon as it is generated, and play it while the rest is still generated
+        character_response = speak_streaming(prompt.format(**prompt_values), tts_engine, audio_path, play=True,
+                                             temperature=0.9, max_tokens=300, stop=[f'{player_name}:'])
+    else:
+        # Create and run the llm chain on the next healthy API key
+        def run_llm_chain(llm):
+            llm_chain = get_chain(prompt, llm)
+            return llm_chain.run(**prompt_values)
 
-    script = f'from {voice_script_path} import create_speech\ncreate_speech("""{character_response}""", """{audio_path}""")'
+        character_response = call_llm(run_llm_chain, temperature=0.9, max_tokens=300, stop=[f'{player_name}:'])
 
-    # Save the script to a temporary file
-    temp_file = "temp.py"
-    with open(temp_file, "w") as file:
-        file.write(script)
+        # print(character_response)
 
-    # Get the path to the python.exe within the venv
-    venv_python = os.path.join(".venv", "Scripts", "python.exe")
+        # Replace newline characters with empty
+        character_response = character_response.replace("\n", "")
 
-    # Execute the script using the venv python.exe
-    subprocess.run([venv_python, temp_file])
+        # Synthesize the reply in-process with the character's voice
+        tts_engine.synthesize(character_response, audio_path)
 
-    # Delete the temporary file
-    os.remove(temp_file)
+    # Append the new line to the conversation and save it back to conversation.json
+    append_line(game_name, character_name,
+                character_name.replace("_", " "), character_response)
 
     return audio_path
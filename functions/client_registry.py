@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+import cohere
+from langchain.llms import Cohere
+from langchain.embeddings import CohereEmbeddings
+from langchain.embeddings.base import Embeddings
+
+# Connection errors of the HTTP libraries the cohere SDK uses, depending on its version
+transport_errors = [ConnectionError, TimeoutError]
+try:
+    import requests
+    transport_errors.append(requests.exceptions.RequestException)
+except ImportError:
+    pass
+try:
+    import httpx
+    transport_errors.append(httpx.TransportError)
+except ImportError:
+    pass
+transport_errors = tuple(transport_errors)
+
+# Seconds a key is skipped after a failed call, doubled for every further failure in a row
+failure_cooldown = 10
+max_failure_cooldown = 300
+
+# Seconds a key is skipped after it was rate limited
+rate_limit_cooldown = 60
+
+
+def is_rate_limited(error):
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message or 'too many requests' in message
+
+
+def is_key_failure(error):
+    # Only errors another key may not run into, authentication, rate limits, server and transport errors.
+    # Anything else, like a bug in the caller's function or an invalid request, fails the same with every key
+    response = getattr(error, 'response', None)
+    status = (getattr(error, 'http_status', None) or getattr(error, 'status_code', None)
+              or getattr(response, 'status_code', None))
+    if isinstance(status, int):
+        return status in (401, 403, 429) or status >= 500
+    if isinstance(error, transport_errors):
+        return True
+    message = str(error).lower()
+    return is_rate_limited(error) or 'invalid api token' in message or 'unauthorized' in message
+
+
+class ClientRegistry:
+    # Reads apikeys.json once and keeps one client per key and settings, so their HTTP sessions stay open
+
+    def __init__(self, keys_path='apikeys.json'):
+        self.keys_path = keys_path
+        self.keys = None
+        self.next_key_index = 0
+        self.failures = {}
+        self.unhealthy_until = {}
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def load_keys(self):
+        if self.keys is None:
+            with open(self.keys_path, 'r') as f:
+                self.keys = json.load(f)['api_keys']
+        return self.keys
+
+    def next_key(self):
+        # Round robin over the keys that are not cooling down
+        with self.lock:
+            keys = self.load_keys()
+            now = time.time()
+            for _ in range(len(keys)):
+                key = keys[self.next_key_index % len(keys)]
+                self.next_key_index += 1
+                if self.unhealthy_until.get(key, 0) <= now:
+                    return key
+
+            # Every key is cooling down, use the one that recovers first
+            return min(keys, key=lambda key: self.unhealthy_until.get(key, 0))
+
+    def report_success(self, key):
+        with self.lock:
+            self.failures[key] = 0
+            self.unhealthy_until.pop(key, None)
+
+    def report_failure(self, key, error):
+        with self.lock:
+            self.failures[key] = self.failures.get(key, 0) + 1
+            if is_rate_limited(error):
+                cooldown = rate_limit_cooldown
+            else:
+                cooldown = min(failure_cooldown * 2 ** (self.failures[key] - 1), max_failure_cooldown)
+            self.unhealthy_until[key] = time.time() + cooldown
+        print(f"API key ...{key[-4:]} failed, skipping it for {cooldown}s: {error}")
+
+    def get(self, kind, key, **params):
+        client_key = (kind, key, json.dumps(params, sort_keys=True))
+        with self.lock:
+            if client_key not in self.clients:
+                if kind == 'client':
+                    self.clients[client_key] = cohere.Client(key)
+                elif kind == 'llm':
+                    self.clients[client_key] = Cohere(cohere_api_key=key, **params)
+                elif kind == 'embeddings':
+                    self.clients[client_key] = CohereEmbeddings(cohere_api_key=key)
+                else:
+                    raise ValueError(f"Unknown client kind {kind}")
+            return self.clients[client_key]
+
+    def call(self, kind, function, **params):
+        # Run function with a client of the next healthy key, moving on to the next key when it fails
+        last_error = None
+        for _ in range(len(self.load_keys())):
+            key = self.next_key()
+            client = self.get(kind, key, **params)
+            try:
+                result = function(client)
+            except Exception as e:
+                if not is_key_failure(e):
+                    raise
+                self.report_failure(key, e)
+                last_error = e
+                continue
+            self.report_success(key)
+            return result
+        raise last_error
+
+
+class RotatingCohereEmbeddings(Embeddings):
+    # Embeddings for vector stores that go through the registry on every call
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def embed_documents(self, texts):
+        return self.registry.call('embeddings', lambda embeddings: embeddings.embed_documents(texts))
+
+    def embed_query(self, text):
+        return self.registry.call('embeddings', lambda embeddings: embeddings.embed_query(text))
+
+
+registry = ClientRegistry()
+embeddings = RotatingCohereEmbeddings(registry)
+
+
+def call_llm(function, **params):
+    params.setdefault('model', 'command')
+    return registry.call('llm', function, **params)
+
+
+def call_client(function):
+    return registry.call('client', function)
+
+
+def get_embeddings():
+    return embeddings
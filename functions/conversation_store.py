@@ -0,0 +1,46 @@
+import json
+from functions.token_length import token_len
+
+
+def line_token_len(sender, message):
+    return token_len(f"{sender}: {message}\n")
+
+
+def load_conversation(game_name, character_name):
+    # Load the existing conversation from conversation.json
+    with open(f'{game_name}/characters/{character_name}/conversation.json', 'r') as f:
+        data = json.load(f)
+    conversation = data['conversation']
+
+    # Conversations saved before token accounting carry no counts, count them once
+    for line in conversation:
+        if 'tokens' not in line:
+            line['tokens'] = line_token_len(line['sender'], line['message'])
+
+    total_tokens = data.get('total_tokens')
+    if total_tokens is None:
+        total_tokens = sum(line['tokens'] for line in conversation)
+
+    return conversation, total_tokens
+
+
+def save_conversation(game_name, character_name, conversation, total_tokens):
+    # Save the conversation together with its running token total
+    with open(f'{game_name}/characters/{character_name}/conversation.json', 'w') as f:
+        json.dump({'conversation': conversation,
+                  'total_tokens': total_tokens}, f)
+
+
+def new_line(sender, message):
+    return {'sender': sender, 'message': message, 'tokens': line_token_len(sender, message)}
+
+
+def append_line(game_name, character_name, sender, message):
+    conversation, total_tokens = load_conversation(game_name, character_name)
+
+    # Only the new line is tokenized
+    line = new_line(sender, message)
+    conversation.append(line)
+
+    save_conversation(game_name, character_name,
+                      conversation, total_tokens + line['tokens'])
@@ -1,25 +1,130 @@
 import os
 import shutil
 import subprocess
+import time
+import atexit
+import secrets
+from multiprocessing.connection import Client, AuthenticationError
+import numpy as np
 
+# Address of the SadTalker animation server, it keeps the models loaded between replies
+server_address = ('localhost', 6150)
+
+# Shared secret of the server, jobs are pickles so only processes that know it may connect. A random one is
+# generated per session and handed to the server through the environment, a server started by hand reads it
+# from the same SADTALKER_AUTHKEY variable (hex)
+server_authkey_variable = 'SADTALKER_AUTHKEY'
+if os.environ.get(server_authkey_variable):
+    server_authkey = bytes.fromhex(os.environ[server_authkey_variable])
+else:
+    server_authkey = secrets.token_bytes(32)
+
+# Seconds to wait for the server to load its checkpoints after starting it
+server_startup_timeout = 300
+
+server_process = None
+
+
+def encode_image(image):
+    # Raw bytes with shape and dtype, numpy pickles are not portable between the numpy 2 of this
+    # environment and the numpy 1.23 pinned in the SadTalker venv
+    image = np.ascontiguousarray(image)
+    return {'data': image.tobytes(), 'shape': image.shape, 'dtype': image.dtype.str}
+
+
+def decode_image(encoded):
+    return np.frombuffer(encoded['data'], dtype=encoded['dtype']).reshape(encoded['shape']).copy()
+
+
+def send_animation_job(job):
+    with Client(server_address, authkey=server_authkey) as conn:
+        conn.send(job)
+        return conn.recv()
+
+
+def stop_animation_server():
+    global server_process
+    if server_process is None:
+        return
+    try:
+        send_animation_job({'command': 'shutdown'})
+        server_process.wait(timeout=30)
+    except Exception:
+        server_process.kill()
+    server_process = None
 
-def create_facial_animation(audio_path, video_output_path, image_path):
-    output_path = f"video_temp"
-    image_file_name = os.path.basename(image_path).split('.')[0]
-    audio_file_name = os.path.basename(audio_path).split('.')[0]
 
-    command = ["SadTalker/venv/scripts/python.exe", "SadTalker/inference.py", "--driven_audio", audio_path,
-               "--source_image", image_path, "--result_dir", output_path, "--still", "--preprocess", "full", "--enhancer", "gfpgan"]
+def start_animation_server():
+    global server_process
 
-    subprocess.run(command)
+    # The server may already be running, e.g. started by hand or by an earlier session
+    try:
+        send_animation_job({'command': 'ping'})
+        return
+    except ConnectionRefusedError:
+        pass
+    except AuthenticationError:
+        raise RuntimeError(f"Another animation server is running on port {server_address[1]} with a different "
+                           f"{server_authkey_variable}, stop it or start it with this session's key")
 
-    # Find the generated video
-    video_folder = os.listdir(output_path)[0]
-    video_path = f"{output_path}/{video_folder}/{image_file_name}##{audio_file_name}_enhanced.mp4"
+    if server_process is None or server_process.poll() is not None:
+        command = ["SadTalker/venv/scripts/python.exe", "SadTalker/animation_server.py",
+                   "--host", server_address[0], "--port", str(server_address[1]), "--preprocess", "full"]
+        # The key goes through the environment, a command line can be read by every local process
+        env = dict(os.environ, **{server_authkey_variable: server_authkey.hex()})
+        server_process = subprocess.Popen(command, env=env)
+        atexit.register(stop_animation_server)
+
+    # Wait until the models are loaded and the server accepts jobs
+    start_time = time.time()
+    while time.time() - start_time < server_startup_timeout:
+        if server_process.poll() is not None:
+            raise RuntimeError("Animation server exited while starting")
+        try:
+            send_animation_job({'command': 'ping'})
+            return
+        except ConnectionRefusedError:
+            time.sleep(1)
+    raise TimeoutError("Animation server did not start in time")
+
+
+def create_facial_animation(audio_path, video_output_path, source_image):
+    output_path = f"video_temp"
+
+    start_animation_server()
+
+    # The source image is a BGR array, it is sent to the server as raw bytes instead of going through a file
+    response = send_animation_job({'command': 'generate', 'args': {
+        'source_image': encode_image(source_image), 'driven_audio': audio_path, 'result_dir': output_path,
+        'still': True, 'enhancer': 'gfpgan'}})
+    if response['status'] != 'ok':
+        raise RuntimeError(f"Facial animation failed: {response['error']}")
 
     # Move the generated video to the new folder
+    video_path = response['video_path']
     shutil.move(video_path, video_output_path)
 
-    # Delete the original subfolder in 'video_temp'
-    subfolder_path = f"{output_path}/{video_folder}"
+    # Delete the job's subfolder in 'video_temp'
+    subfolder_path = os.path.dirname(video_path)
     shutil.rmtree(subfolder_path)
+
+
+def stream_facial_animation(audio_path, source_image, chunk_size=8):
+    output_path = f"video_temp"
+
+    start_animation_server()
+
+    # Frames are yielded chunk by chunk while the server is still rendering the rest of the clip
+    with Client(server_address, authkey=server_authkey) as conn:
+        conn.send({'command': 'generate_stream', 'args': {
+            'source_image': encode_image(source_image), 'driven_audio': audio_path, 'result_dir': output_path,
+            'still': True, 'enhancer': 'gfpgan', 'chunk_size': chunk_size}})
+        while True:
+            response = conn.recv()
+            if response['status'] == 'frames':
+                for frame in response['frames']:
+                    yield decode_image(frame)
+            elif response['status'] == 'ok':
+                break
+            else:
+                raise RuntimeError(f"Facial animation failed: {response['error']}")
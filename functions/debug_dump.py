@@ -0,0 +1,18 @@
+import os
+import cv2
+
+# Write the intermediate frames of a turn to temp/ so they can be inspected, off by default
+debug_dump = False
+debug_dump_dir = 'temp'
+
+
+def set_debug_dump(enabled):
+    global debug_dump
+    debug_dump = enabled
+
+
+def dump_image(name, image):
+    # Frames are passed between the stages in memory, files are only written for debugging
+    if debug_dump and image is not None:
+        os.makedirs(debug_dump_dir, exist_ok=True)
+        cv2.imwrite(os.path.join(debug_dump_dir, f'{name}.jpg'), image)
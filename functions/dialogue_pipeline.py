@@ -0,0 +1,135 @@
+import re
+import time
+import wave
+import queue
+import threading
+import itertools
+import pyaudio
+from functions.client_registry import call_client
+
+# A sentence ends at ., ! or ? (optionally followed by closing quotes or brackets) and whitespace
+sentence_end = re.compile(r'[.!?]+["\')\]]*\s+')
+
+# Sentences shorter than this are joined with the next one, so the TTS engine is not called per word
+min_sentence_length = 20
+
+
+def open_token_stream(co, prompt, temperature, max_tokens, stop):
+    # Newer cohere clients have generate_stream, older ones stream from generate
+    if hasattr(co, 'generate_stream'):
+        events = co.generate_stream(prompt=prompt, model='command', temperature=temperature,
+                                    max_tokens=max_tokens, stop_sequences=stop)
+        tokens = (event.text for event in events if getattr(event, 'event_type', None) == 'text-generation')
+    else:
+        events = co.generate(prompt=prompt, model='command', temperature=temperature,
+                             max_tokens=max_tokens, stop_sequences=stop, stream=True)
+        tokens = (event.text for event in events)
+
+    # Wait for the first token here so a failing API key is retried on the next one
+    first_token = next(tokens, '')
+    return itertools.chain([first_token], tokens)
+
+
+def stream_llm_tokens(prompt, temperature=0.9, max_tokens=300, stop=None):
+    stop = stop or []
+    tokens = call_client(lambda co: open_token_stream(co, prompt, temperature, max_tokens, stop))
+
+    # Cohere returns the stop sequence with the text, cut it off like LLMChain does.
+    # The last characters are held back until it is clear they do not start a stop sequence
+    hold_back = max((len(stop_sequence) for stop_sequence in stop), default=1) - 1
+    text = ''
+    emitted = 0
+    for token in tokens:
+        text += token
+        stop_indices = [text.find(stop_sequence) for stop_sequence in stop if stop_sequence in text]
+        if stop_indices:
+            yield text[emitted:min(stop_indices)]
+            return
+        if len(text) - hold_back > emitted:
+            yield text[emitted:len(text) - hold_back]
+            emitted = len(text) - hold_back
+    yield text[emitted:]
+
+
+def split_sentences(tokens):
+    # Yield every complete sentence as soon as the token that ends it arrives
+    buffer = ''
+    for token in tokens:
+        buffer += token.replace("\n", " ")
+        start = 0
+        for match in sentence_end.finditer(buffer):
+            if match.end() - start >= min_sentence_length:
+                yield buffer[start:match.end()].strip()
+                start = match.end()
+        buffer = buffer[start:]
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def play_audio_chunks(audio_chunks, sample_rate, start_time):
+    # Play PCM chunks as they are queued, None marks the end of the reply
+    player = pyaudio.PyAudio()
+    stream = player.open(format=pyaudio.paInt16, channels=1, rate=sample_rate, output=True)
+    first_chunk = True
+    try:
+        for chunk in iter(audio_chunks.get, None):
+            if first_chunk:
+                print(f"First audio after {time.perf_counter() - start_time:.2f}s")
+                first_chunk = False
+            stream.write(chunk.tobytes())
+    finally:
+        stream.stop_stream()
+        stream.close()
+        player.terminate()
+
+
+def speak_streaming(prompt, tts_engine, audio_path, play=True, temperature=0.9, max_tokens=300, stop=None):
+    # LLM tokens -> sentences -> TTS -> playback, every stage runs while the previous one is still producing
+    start_time = time.perf_counter()
+    sentences = queue.Queue()
+    audio_chunks = queue.Queue()
+    errors = []
+
+    def synthesize():
+        # Synthesize each sentence as soon as it is complete and save the whole reply as one wav
+        try:
+            with wave.open(audio_path, 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(tts_engine.sample_rate)
+                for sentence in iter(sentences.get, None):
+                    for chunk in tts_engine.stream(sentence):
+                        f.writeframes(chunk.tobytes())
+                        if play:
+                            audio_chunks.put(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            audio_chunks.put(None)
+
+    synthesize_thread = threading.Thread(target=synthesize, daemon=True)
+    synthesize_thread.start()
+    if play:
+        playback_thread = threading.Thread(target=play_audio_chunks, args=(
+            audio_chunks, tts_engine.sample_rate, start_time), daemon=True)
+        playback_thread.start()
+
+    response_sentences = []
+    try:
+        for sentence in split_sentences(stream_llm_tokens(prompt, temperature, max_tokens, stop)):
+            if not response_sentences:
+                print(f"First sentence after {time.perf_counter() - start_time:.2f}s")
+            response_sentences.append(sentence)
+            sentences.put(sentence)
+    finally:
+        sentences.put(None)
+
+    synthesize_thread.join()
+    if play:
+        playback_thread.join()
+    if errors:
+        raise errors[0]
+
+    print(f"Reply spoken in {time.perf_counter() - start_time:.2f}s")
+    return " ".join(response_sentences)
@@ -0,0 +1,110 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from deepface import DeepFace
+from functions.face_detector import face_region
+
+# Heads that can be run on an aligned face
+attribute_actions = ['emotion', 'age', 'gender', 'race']
+
+# Faces kept with their aligned crop and the heads already run on them, least recently used first
+cache_size = 8
+
+# image hash -> {'aligned': BGR crop, 'emotion': ..., 'embedding': ...}
+analyses = OrderedDict()
+analyses_lock = threading.Lock()
+
+
+def image_key(image):
+    if isinstance(image, str):
+        # Files are keyed by path and modification time, e.g. a character's face.jpg
+        return ('file', os.path.abspath(image), os.path.getmtime(image))
+    image_hash = hashlib.sha1(np.ascontiguousarray(image).tobytes())
+    image_hash.update(str(image.shape).encode())
+    return ('array', image_hash.hexdigest())
+
+
+def align_face(image):
+    # The only detection pass, the heads below run on its aligned crop with detector 'skip'.
+    # Raises like DeepFace.analyze when there is no face
+    if isinstance(image, str):
+        image = cv2.imread(image)
+    region = face_region(image)
+    try:
+        face = DeepFace.extract_faces(img_path=region, detector_backend='retinaface', align=True)[0]['face']
+    except ValueError:
+        # The fast detector's box was a false positive, look in the whole image like cascade_faces does
+        if region is image:
+            raise
+        face = DeepFace.extract_faces(img_path=image, detector_backend='retinaface', align=True)[0]['face']
+
+    # extract_faces returns RGB in [0, 1], the models expect BGR like cv2.imread
+    return np.ascontiguousarray((face[:, :, ::-1] * 255).astype(np.uint8))
+
+
+def run_heads(aligned, actions):
+    results = {}
+    attributes = [action for action in attribute_actions
+                  if action in actions or (action == 'emotion' and 'emotion_scores' in actions)]
+    if attributes:
+        objs = DeepFace.analyze(img_path=aligned, actions=attributes, silent=True,
+                                detector_backend='skip', enforce_detection=False)
+        if 'emotion' in attributes:
+            results['emotion'] = objs[0]['dominant_emotion']
+            results['emotion_scores'] = objs[0]['emotion']
+        if 'age' in attributes:
+            results['age'] = objs[0]['age']
+        if 'gender' in attributes:
+            results['gender'] = objs[0]['dominant_gender']
+        if 'race' in attributes:
+            results['race'] = objs[0]['dominant_race']
+    if 'embedding' in actions:
+        embedding = DeepFace.represent(img_path=aligned, model_name='Facenet512',
+                                       detector_backend='skip', enforce_detection=False)[0]['embedding']
+        results['embedding'] = np.asarray(embedding, dtype=np.float32)
+    return results
+
+
+def analyze_faces(images, actions=('emotion', 'age', 'gender', 'race', 'embedding'), cache=True):
+    # images are paths or BGR arrays, each face is detected once and each head runs once per face,
+    # also across calls, so identification and background NPC creation share one detection.
+    # Frames that are only analyzed once, like webcam samples, should not push those out of the cache
+    analyzed = []
+    for image in images:
+        if not cache:
+            analysis = {'aligned': align_face(image)}
+            analysis.update(run_heads(analysis['aligned'], actions))
+            analyzed.append({action: analysis[action] for action in actions})
+            continue
+
+        key = image_key(image)
+        with analyses_lock:
+            analysis = analyses.get(key)
+            if analysis is not None:
+                analyses.move_to_end(key)
+
+        if analysis is None:
+            analysis = {'aligned': align_face(image)}
+
+        missing = [action for action in actions if action not in analysis]
+        if missing:
+            analysis.update(run_heads(analysis['aligned'], missing))
+
+        with analyses_lock:
+            analyses[key] = analysis
+            if len(analyses) > cache_size:
+                analyses.popitem(last=False)
+
+        analyzed.append({action: analysis[action] for action in actions})
+    return analyzed
+
+
+def analyze_face(image, actions=('emotion', 'age', 'gender', 'race', 'embedding'), cache=True):
+    return analyze_faces([image], actions, cache)[0]
+
+
+def cosine_distance(a, b):
+    return 1 - float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
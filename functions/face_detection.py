@@ -1,20 +1,35 @@
 import cv2
-from deepface import DeepFace
+from functions.face_tracker import face_tracker
+from functions.face_detector import detect_faces
 
 
-def save_extracted_face(image_path, output_path="face.jpg"):
-    # Load the image using OpenCV
-    image = cv2.imread(image_path)
+def detect_faces_tracked(image):
+    # Run RetinaFace around the tracked face, the whole frame is only searched when tracking is lost
+    roi = face_tracker.roi(image)
+    if roi is not None:
+        roi_x, roi_y, roi_w, roi_h = roi
+        face_objs = detect_faces(image[roi_y:roi_y + roi_h, roi_x:roi_x + roi_w].copy())
+        if len(face_objs) > 0:
+            # Move the boxes back to frame coordinates
+            for face in face_objs:
+                face['facial_area']['x'] += roi_x
+                face['facial_area']['y'] += roi_y
+            return face_objs
+        print("Tracked face not found, detecting on the full frame")
+    return detect_faces(image)
 
-    try:
-        # Extract faces using DeepFace
-        face_objs = DeepFace.extract_faces(
-            img_path=image_path,
-            detector_backend='retinaface',
-        )
-    except Exception as e:
+
+def extract_face(image, use_tracker=True):
+    # image is a BGR array, the face is cropped in memory and returned with its coordinates
+    if use_tracker:
+        face_objs = detect_faces_tracked(image)
+    else:
+        face_objs = detect_faces(image)
+
+    if len(face_objs) == 0:
+        face_tracker.reset()
         print("No Faces Detected")
-        return 'NULL', 'NULL'
+        return None, 'NULL'
 
     # Check the number of detected faces
     num_faces = len(face_objs)
@@ -30,6 +45,9 @@ def save_extracted_face(image_path, output_path="face.jpg"):
             face['facial_area']['h']
         )
 
+        # Follow this face until the next interaction
+        face_tracker.set_face(image, (x, y, w, h))
+
         # Calculate the center of the face region
         center_x = x + (w // 2)
         center_y = y + (h // 2)
@@ -44,10 +62,7 @@ def save_extracted_face(image_path, output_path="face.jpg"):
         extracted_face = image[extended_y:extended_y +
                                extended_h, extended_x:extended_x + extended_w]
 
-        # Save the extracted face to the output path
-        cv2.imwrite(output_path, extracted_face)
-
-        return output_path, (extended_x, extended_y, extended_w, extended_h)
+        return extracted_face, (extended_x, extended_y, extended_w, extended_h)
     else:
         print("Multiple Faces Detected")
         # Find the face with the highest face_confidence
@@ -62,6 +77,9 @@ def save_extracted_face(image_path, output_path="face.jpg"):
             highest_confidence_face['facial_area']['h']
         )
 
+        # Follow this face until the next interaction
+        face_tracker.set_face(image, (x, y, w, h))
+
         # Calculate the center of the face region
         center_x = x + (w // 2)
         center_y = y + (h // 2)
@@ -76,7 +94,18 @@ def save_extracted_face(image_path, output_path="face.jpg"):
         extracted_face = image[extended_y:extended_y +
                                extended_h, extended_x:extended_x + extended_w]
 
-        # Save the extracted face to the output path
-        cv2.imwrite(output_path, extracted_face)
+        return extracted_face, (extended_x, extended_y, extended_w, extended_h)
+
+
+def save_extracted_face(image_path, output_path="face.jpg"):
+    # Load the image using OpenCV
+    image = cv2.imread(image_path)
+
+    extracted_face, coordinates = extract_face(image)
+    if extracted_face is None:
+        return 'NULL', 'NULL'
+
+    # Save the extracted face to the output path
+    cv2.imwrite(output_path, extracted_face)
 
-        return output_path, (extended_x, extended_y, extended_w, extended_h)
+    return output_path, coordinates
@@ -0,0 +1,158 @@
+import os
+import time
+import argparse
+import cv2
+from deepface import DeepFace
+from functions.face_tracker import expand_box
+
+# 'cascade' proposes faces with a fast detector on a downscaled frame and confirms them with RetinaFace on crops,
+# 'retinaface' runs RetinaFace on the full frame (slower, finds faces the fast detector misses)
+detector_mode = 'cascade'
+
+# Fast detector used for the proposals, 'yunet' needs the model file below, otherwise Haar is used
+proposal_backend = 'yunet'
+yunet_model_path = 'models/face_detection_yunet_2023mar.onnx'
+
+# Scale of the frame the fast detector runs on
+proposal_downscale = 0.25
+
+# Candidate boxes are grown by this factor before RetinaFace confirms them
+candidate_scale = 2.0
+
+# Run RetinaFace on the full frame when the fast detector proposes nothing it confirms
+cascade_fallback = True
+
+# Images no larger than this on either side are already a face crop, e.g. an extracted face or face.jpg,
+# face_region returns them whole
+face_crop_size = 400
+
+haar_detector = None
+yunet_detector = None
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    overlap_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    overlap = overlap_w * overlap_h
+    union = aw * ah + bw * bh - overlap
+    return overlap / union if union > 0 else 0.0
+
+
+def propose_faces(image):
+    # Candidate (x, y, w, h) boxes in full frame coordinates from the fast detector on a downscaled frame
+    global haar_detector, yunet_detector
+    small = cv2.resize(image, None, fx=proposal_downscale, fy=proposal_downscale, interpolation=cv2.INTER_AREA)
+
+    if proposal_backend == 'yunet' and os.path.isfile(yunet_model_path) and hasattr(cv2, 'FaceDetectorYN'):
+        if yunet_detector is None:
+            yunet_detector = cv2.FaceDetectorYN.create(yunet_model_path, '', (small.shape[1], small.shape[0]))
+        yunet_detector.setInputSize((small.shape[1], small.shape[0]))
+        _, faces = yunet_detector.detect(small)
+        boxes = [] if faces is None else [face[:4] for face in faces]
+    else:
+        if haar_detector is None:
+            haar_detector = cv2.CascadeClassifier(
+                os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml'))
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        boxes = haar_detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(12, 12))
+
+    return [tuple(int(value / proposal_downscale) for value in box) for box in boxes]
+
+
+def retinaface_faces(image):
+    try:
+        return DeepFace.extract_faces(img_path=image, detector_backend='retinaface')
+    except ValueError:
+        # DeepFace raises a ValueError when there is no face
+        return []
+
+
+def cascade_faces(image):
+    faces = []
+    for box in propose_faces(image):
+        crop_x, crop_y, crop_w, crop_h = expand_box(box, candidate_scale, image.shape)
+        for face in retinaface_faces(image[crop_y:crop_y + crop_h, crop_x:crop_x + crop_w].copy()):
+            # Move the box back to frame coordinates
+            face['facial_area']['x'] += crop_x
+            face['facial_area']['y'] += crop_y
+            faces.append(face)
+
+    # Overlapping candidates can confirm the same face twice, keep the more confident one
+    faces.sort(key=lambda face: face['confidence'], reverse=True)
+    unique_faces = []
+    for face in faces:
+        area = face['facial_area']
+        box = (area['x'], area['y'], area['w'], area['h'])
+        if all(box_iou(box, (kept['facial_area']['x'], kept['facial_area']['y'], kept['facial_area']['w'],
+                                 kept['facial_area']['h'])) < 0.5 for kept in unique_faces):
+            unique_faces.append(face)
+
+    if len(unique_faces) == 0 and cascade_fallback:
+        return retinaface_faces(image)
+    return unique_faces
+
+
+def detect_faces(image, mode=None):
+    # Same result format as DeepFace.extract_faces, an empty list when there is no face
+    if (mode or detector_mode) == 'cascade':
+        return cascade_faces(image)
+    return retinaface_faces(image)
+
+
+def face_region(image, mode=None):
+    # Crop around the most likely face for the DeepFace calls that detect again themselves,
+    # so their RetinaFace pass only sees a small image. The whole image is returned in 'retinaface' mode,
+    # for face crops and when nothing is proposed, the caller retries on the whole image when the crop has no face
+    if isinstance(image, str):
+        image = cv2.imread(image)
+    if (mode or detector_mode) != 'cascade' or max(image.shape[:2]) <= face_crop_size:
+        return image
+
+    boxes = propose_faces(image)
+    if len(boxes) == 0:
+        return image
+    box = max(boxes, key=lambda box: box[2] * box[3])
+    crop_x, crop_y, crop_w, crop_h = expand_box(box, candidate_scale, image.shape)
+    return image[crop_y:crop_y + crop_h, crop_x:crop_x + crop_w].copy()
+
+
+def benchmark(image_paths, repeats=3):
+    # Compare latency and the detected faces of the two modes on the same images
+    timings = {'retinaface': [], 'cascade': []}
+    matches = 0
+    for image_path in image_paths:
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Cannot read {image_path}")
+            continue
+
+        best_boxes = {}
+        for mode in timings:
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                faces = detect_faces(image, mode)
+                timings[mode].append(time.perf_counter() - start_time)
+            if faces:
+                area = max(faces, key=lambda face: face['confidence'])['facial_area']
+                best_boxes[mode] = (area['x'], area['y'], area['w'], area['h'])
+            print(f"{image_path} {mode}: {len(faces)} faces, {timings[mode][-1] * 1000:.1f}ms")
+
+        # Both modes agree when they pick the same most confident face, or both find none
+        if len(best_boxes) == 0 or (len(best_boxes) == 2 and box_iou(best_boxes['retinaface'], best_boxes['cascade']) >= 0.5):
+            matches += 1
+
+    for mode, mode_timings in timings.items():
+        if mode_timings:
+            print(f"{mode}: mean {sum(mode_timings) / len(mode_timings) * 1000:.1f}ms over {len(mode_timings)} runs")
+    print(f"Same face found on {matches} of {len(image_paths)} images")
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare full-frame RetinaFace with the cascaded detector")
+    parser.add_argument('images', nargs='+', help="screenshots to run both detectors on")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.images, args.repeats)
@@ -0,0 +1,81 @@
+import os
+import glob
+import pickle
+import numpy as np
+from functions.face_analysis import analyze_face
+
+# Cosine distance above which a face is not matched to any character (DeepFace's Facenet512 threshold)
+cosine_threshold = 0.30
+
+# Length of a Facenet512 embedding, representations of other models are skipped
+embedding_size = 512
+
+# (game_name, characters) -> (normalized embedding matrix, character name of every row)
+galleries = {}
+
+
+def load_gallery(game_name, characters_list):
+    embeddings = []
+    labels = []
+
+    # Read the Facenet512 representations DeepFace saved next to each character's images
+    for character_name in characters_list:
+        character_embeddings = len(embeddings)
+        for representations_path in glob.glob(f"{game_name}/characters/{character_name}/images/*.pkl"):
+            # DeepFace names the file after the model, e.g. representations_facenet512.pkl, other models
+            # saved in the same folder embed into another space
+            if 'facenet512' not in os.path.basename(representations_path).lower():
+                continue
+            with open(representations_path, 'rb') as f:
+                representations = pickle.load(f)
+
+            for representation in representations:
+                # Older DeepFace versions store [identity, embedding], newer ones store a dict
+                if isinstance(representation, dict):
+                    embedding = representation['embedding']
+                else:
+                    embedding = representation[1]
+                if len(embedding) != embedding_size:
+                    continue
+                embeddings.append(embedding)
+                labels.append(character_name)
+
+        if len(embeddings) == character_embeddings:
+            print(f"Warning: no face embeddings for {character_name}, they cannot be identified. "
+                  f"Run create_face_recognition_representation.ipynb for them")
+
+    if len(embeddings) == 0:
+        return np.zeros((0, embedding_size), dtype=np.float32), np.asarray(labels)
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix, np.asarray(labels)
+
+
+def get_gallery(game_name, characters_list):
+    key = (game_name, tuple(characters_list))
+    if key not in galleries:
+        galleries[key] = load_gallery(game_name, characters_list)
+    return galleries[key]
+
+
+def identify_face(game_name, characters_list, image, threshold=None):
+    if threshold is None:
+        threshold = cosine_threshold
+
+    matrix, labels = get_gallery(game_name, characters_list)
+    if len(labels) == 0:
+        return 'NULL', float('inf')
+
+    # Embed the query face (a path or a BGR array) once and score it against every character at once,
+    # the analysis keeps its detection for the other heads that run on the same face
+    query = analyze_face(image, ['embedding'])['embedding']
+    query = query / np.linalg.norm(query)
+
+    cosine_distances = 1 - matrix @ query
+    best_index = int(np.argmin(cosine_distances))
+    best_distance = float(cosine_distances[best_index])
+
+    if best_distance > threshold:
+        return 'NULL', best_distance
+    return str(labels[best_index]), best_distance
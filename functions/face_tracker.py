@@ -0,0 +1,86 @@
+import threading
+import cv2
+
+# Lowest normalized correlation at which the tracked face counts as found
+tracking_threshold = 0.6
+
+# The template is searched for in the face box grown by this factor around its center
+search_scale = 3.0
+
+# RetinaFace runs on the tracked box grown by this factor around its center
+roi_scale = 2.5
+
+# Template matching runs on frames scaled down by this factor
+track_downscale = 0.5
+
+
+def expand_box(box, scale, frame_shape):
+    # Grow (x, y, w, h) around its center and clip it to the frame
+    x, y, w, h = box
+    center_x, center_y = x + w / 2, y + h / 2
+    left = max(0, int(center_x - w * scale / 2))
+    top = max(0, int(center_y - h * scale / 2))
+    right = min(frame_shape[1], int(center_x + w * scale / 2))
+    bottom = min(frame_shape[0], int(center_y + h * scale / 2))
+    return left, top, right - left, bottom - top
+
+
+class FaceTracker:
+    # Follows the last detected face box across frames with template matching
+
+    def __init__(self):
+        self.box = None
+        self.template = None
+        self.confidence = 0.0
+        self.lock = threading.Lock()
+
+    def prepare(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, None, fx=track_downscale, fy=track_downscale, interpolation=cv2.INTER_AREA)
+
+    def set_face(self, frame, box):
+        # Called after every detection, so the template follows changes of the face's appearance
+        x, y, w, h = box
+        with self.lock:
+            self.template = self.prepare(frame[y:y + h, x:x + w])
+            self.box = box
+            self.confidence = 1.0
+
+    def reset(self):
+        with self.lock:
+            self.box = None
+            self.template = None
+            self.confidence = 0.0
+
+    def update(self, frame):
+        # Move the box to where the template matches best near its last position, None once the face is lost
+        with self.lock:
+            if self.box is None:
+                return None
+
+            search_x, search_y, search_w, search_h = expand_box(self.box, search_scale, frame.shape)
+            search = self.prepare(frame[search_y:search_y + search_h, search_x:search_x + search_w])
+            if search.shape[0] < self.template.shape[0] or search.shape[1] < self.template.shape[1]:
+                self.box, self.confidence = None, 0.0
+                return None
+
+            scores = cv2.matchTemplate(search, self.template, cv2.TM_CCOEFF_NORMED)
+            _, max_score, _, max_location = cv2.minMaxLoc(scores)
+            self.confidence = max_score
+            if max_score < tracking_threshold:
+                self.box = None
+                return None
+
+            self.box = (search_x + int(max_location[0] / track_downscale),
+                        search_y + int(max_location[1] / track_downscale), self.box[2], self.box[3])
+            return self.box
+
+    def roi(self, frame):
+        # Region to run the detector on, None when a full-frame detection is needed
+        box = self.update(frame)
+        if box is None:
+            return None
+        return expand_box(box, roi_scale, frame.shape)
+
+
+face_tracker = FaceTracker()
@@ -1,10 +1,9 @@
-from deepface import DeepFace
+from functions.face_analysis import analyze_face
 
 
-def get_age_gender_race(image_path):
-    objs = DeepFace.analyze(img_path=image_path, actions=[
-                            'age', 'gender', 'race'], silent=True, detector_backend='retinaface')
-    age = objs[0]['age']
-    gender = objs[0]['dominant_gender']
-    race = objs[0]['dominant_race']
+def get_age_gender_race(image):
+    analysis = analyze_face(image, ['age', 'gender', 'race'])
+    age = analysis['age']
+    gender = analysis['gender']
+    race = analysis['race']
     return age, gender, race
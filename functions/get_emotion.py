@@ -1,8 +1,6 @@
-from deepface import DeepFace
+from functions.face_analysis import analyze_face
 
 
 def get_emotion(image_path):
-    objs = DeepFace.analyze(img_path=image_path, actions=[
-                            'emotion'], silent='True', detector_backend='retinaface')
-    emotion = objs[0]['dominant_emotion']
+    emotion = analyze_face(image_path, ['emotion'])['emotion']
     return emotion
@@ -1,5 +1,4 @@
-import cv2
-from functions.face_detection import save_extracted_face
+from functions.face_detection import extract_face
 from functions.find_character import find_character_with_lowest_cosine_score
 from functions.audio_generate_side_character import audio_generate_side_character
 from functions.audio_generate_background_character import audio_generate_background_character
@@ -7,44 +6,72 @@ from functions.webcam_photo_emotion_predictor import webcam_photo_emotion_predic
 from functions.get_name import get_name
 from functions.video_generate_background_character import video_generate_background_character
 from functions.video_generate_side_character import video_generate_side_character
+from functions.stage_scheduler import run_stages, print_stage_report
+from functions.prompt_context_cache import print_cache_report
+from functions.debug_dump import dump_image
 
 
-def main(screen, transcribed_text, player_name, game_name, characters, facial_animation_switch):
-    facial_animation_video_path, audio_path, coordinates = '', '', ''
+def main(screen, transcribed_text, player_name, game_name, characters, facial_animation_switch, facial_animation_streaming=False, dialogue_streaming=False, speculation=None):
 
-    # Save the screen capture to a file
-    cv2.imwrite('temp/screen.jpg', screen)
+    def extract_screen_face():
+        # Extract and Crop face, the screen stays in memory
+        if facial_animation_switch == False:
+            return None, ''
+        dump_image('screen', screen)
+        extracted_face, coordinates = extract_face(screen)
+        dump_image('extracted_face', extracted_face)
+        return extracted_face, coordinates
 
-    # Extract and Crop face
-    output_path, coordinates = save_extracted_face(
-        'temp/screen.jpg', output_path='temp/extracted_face.jpg')
+    def identify_character(face):
+        extracted_face, coordinates = face
+        if extracted_face is None:
+            return None
+        return find_character_with_lowest_cosine_score(game_name,
+                                                       characters, extracted_face)
 
-    # Get user facial emotion
-    emotion = webcam_photo_emotion_predictor()
+    def generate(face, character_name, emotion):
+        facial_animation_video_path, audio_path = '', ''
+        extracted_face, coordinates = face
 
-    if facial_animation_switch == False:
-        output_path = 'NULL'
-        
-    if output_path == 'NULL':
-        character_name = get_name(transcribed_text, characters)
-        if character_name:
-            print("Character is ", character_name)
-            audio_path = audio_generate_side_character(
-                transcribed_text, player_name, game_name, character_name, emotion)
+        if extracted_face is None:
+            character_name = get_name(transcribed_text, characters)
+            if character_name:
+                print("Character is ", character_name)
+                audio_path = audio_generate_side_character(
+                    transcribed_text, player_name, game_name, character_name, emotion, streaming=dialogue_streaming)
+            else:
+                print("Character is background character")
+                audio_path = audio_generate_background_character(
+                    transcribed_text, player_name, game_name, emotion, streaming=dialogue_streaming)
+
+            # The reply was already played while it was generated, there is nothing left to play
+            if dialogue_streaming:
+                audio_path = ''
+            return facial_animation_video_path, audio_path, coordinates
+
+        if character_name == 'NULL':
+            facial_animation_video_path, audio_path = video_generate_background_character(
+                transcribed_text, player_name, game_name, extracted_face, emotion, stream=facial_animation_streaming, streaming=dialogue_streaming)
         else:
-            print("Character is background character")
-            audio_path = audio_generate_background_character(
-                transcribed_text, player_name, game_name, emotion)
-        return facial_animation_video_path, audio_path, coordinates
+            facial_animation_video_path, audio_path = video_generate_side_character(
+                transcribed_text, player_name, game_name, character_name, extracted_face, emotion, stream=facial_animation_streaming, streaming=dialogue_streaming)
 
-    character_name = find_character_with_lowest_cosine_score(game_name,
-                                                             characters, 'temp/extracted_face.jpg')
+        return facial_animation_video_path, audio_path, coordinates
 
-    if character_name == 'NULL':
-        facial_animation_video_path, audio_path = video_generate_background_character(
-            transcribed_text, player_name, game_name, 'temp/extracted_face.jpg', emotion)
-    else:
-        facial_animation_video_path, audio_path = video_generate_side_character(
-            transcribed_text, player_name, game_name, character_name, 'temp/extracted_face.jpg', emotion)
+    # Face extraction and identification do not depend on the webcam emotion, so they run side by side
+    stages = {
+        'extract_face': (extract_screen_face, []),
+        'identify_character': (identify_character, ['extract_face']),
+        'webcam_emotion': (webcam_photo_emotion_predictor, []),
+        'generate': (generate, ['extract_face', 'identify_character', 'webcam_emotion']),
+    }
+    if speculation is not None:
+        # Extraction and identification already ran on the key press frame while the player was speaking
+        stages['extract_face'] = (lambda: speculation.result()['face'], [])
+        stages['identify_character'] = (
+            lambda _: speculation.result()['character_name'], ['extract_face'])
+    results, timings, critical_path, critical_path_time = run_stages(stages)
+    print_stage_report(timings, critical_path, critical_path_time)
+    print_cache_report()
 
-    return facial_animation_video_path, audio_path, coordinates
+    return results['generate']
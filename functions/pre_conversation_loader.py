@@ -1,12 +1,12 @@
-import json
 from functions.token_length import token_len
+from functions.prompt_context_cache import read_json
 import random
 
 
 def pre_conversation_loader(game_name, character_name):
-    # Load conversation from JSON file
-    with open(f'{game_name}/characters/{character_name}/pre_conversation.json', 'r') as f:
-        pre_conversation = json.load(f)['pre_conversation']
+    # Load conversation from JSON file, copied because the cached list is shuffled below
+    pre_conversation = list(read_json(
+        f'{game_name}/characters/{character_name}/pre_conversation.json')['pre_conversation'])
 
     # Shuffle the lines randomly
     random.shuffle(pre_conversation)
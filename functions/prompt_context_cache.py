@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import threading
+from langchain import PromptTemplate, LLMChain
+
+# path -> (mtime_ns, size, contents, seconds it took to load)
+files = {}
+
+# template -> (PromptTemplate, seconds it took to build)
+prompts = {}
+
+# (id of the PromptTemplate, id of the llm) -> LLMChain, the llms are pooled by the client registry
+chains = {}
+
+stats = {'hits': 0, 'misses': 0, 'saved_seconds': 0.0}
+cache_lock = threading.Lock()
+
+
+def load_file(path, parse):
+    # Reload the file only when its modification time or size changed since it was cached
+    file_stat = os.stat(path)
+    with cache_lock:
+        cached = files.get(path)
+        if cached is not None and cached[:2] == (file_stat.st_mtime_ns, file_stat.st_size):
+            stats['hits'] += 1
+            stats['saved_seconds'] += cached[3]
+            return cached[2]
+
+    start_time = time.perf_counter()
+    with open(path, 'r') as f:
+        contents = parse(f)
+    load_seconds = time.perf_counter() - start_time
+
+    with cache_lock:
+        stats['misses'] += 1
+        files[path] = (file_stat.st_mtime_ns, file_stat.st_size, contents, load_seconds)
+    return contents
+
+
+def read_text(path):
+    return load_file(path, lambda f: f.read())
+
+
+def read_json(path):
+    # The cached object is shared, callers that modify it must copy it first
+    return load_file(path, json.load)
+
+
+def get_prompt(template, input_variables):
+    with cache_lock:
+        if template in prompts:
+            stats['hits'] += 1
+            stats['saved_seconds'] += prompts[template][1]
+            return prompts[template][0]
+
+    start_time = time.perf_counter()
+    prompt = PromptTemplate(template=template, input_variables=input_variables)
+    build_seconds = time.perf_counter() - start_time
+
+    with cache_lock:
+        stats['misses'] += 1
+        prompts[template] = (prompt, build_seconds)
+    return prompt
+
+
+def get_chain(prompt, llm):
+    with cache_lock:
+        chain_key = (id(prompt), id(llm))
+        if chain_key not in chains:
+            chains[chain_key] = LLMChain(prompt=prompt, llm=llm)
+        return chains[chain_key]
+
+
+def print_cache_report():
+    print(f"Prompt context cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['saved_seconds'] * 1000:.1f}ms of prompt assembly saved")
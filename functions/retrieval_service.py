@@ -0,0 +1,107 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from langchain.vectorstores import Chroma
+from functions.client_registry import get_embeddings
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+    print("psutil is not installed, vector stores are only evicted by count and not when memory is low")
+
+# Most vector stores kept open at the same time
+max_open_stores = 16
+
+# Stores are also evicted while less than this much system memory is available (needs psutil)
+min_available_memory_mb = 1024
+
+# persist_directory -> open Chroma store, least recently used first
+stores = OrderedDict()
+stores_lock = threading.Lock()
+
+
+def memory_is_tight():
+    if psutil is None:
+        return False
+    return psutil.virtual_memory().available < min_available_memory_mb * 1024 * 1024
+
+
+def evict_stores():
+    # Always keep the store that was just opened or used
+    while len(stores) > 1 and (len(stores) > max_open_stores or memory_is_tight()):
+        persist_directory, _ = stores.popitem(last=False)
+        print(f"Closed vector store {persist_directory}")
+
+
+def get_store(persist_directory):
+    with stores_lock:
+        if persist_directory in stores:
+            stores.move_to_end(persist_directory)
+            return stores[persist_directory]
+
+        # Open the store from disk once, the index stays in memory for the following lines
+        vectordb = Chroma(persist_directory=persist_directory,
+                          embedding_function=get_embeddings())
+        stores[persist_directory] = vectordb
+        evict_stores()
+        return vectordb
+
+
+def get_public_store(game_name):
+    return get_store(f'{game_name}/public_vectordb')
+
+
+def get_character_store(game_name, character_name):
+    return get_store(f'{game_name}/characters/{character_name}/vectordb')
+
+
+def close_stores():
+    with stores_lock:
+        stores.clear()
+
+
+def build_query(conversation):
+    # The last 5 lines of the conversation are the retrieval query
+    if len(conversation) > 5:
+        conversation = conversation[-5:]
+
+    conversation_string = ''
+    for line in conversation:
+        conversation_string += line['sender'] + ": " + line['message'] + '\n'
+    return conversation_string
+
+
+def search_store(vectordb, query_embedding, k):
+    start_time = time.perf_counter()
+    docs = vectordb.similarity_search_by_vector(query_embedding, k=k)
+    return "\n".join(doc.page_content for doc in docs), time.perf_counter() - start_time
+
+
+def retrieve_context(game_name, character_name, include_character_data=True, k=1):
+    # Read the conversation once and embed the query once, then search every store with the same vector
+    timings = {}
+    start_time = time.perf_counter()
+    with open(f'{game_name}/characters/{character_name}/conversation.json', 'r') as f:
+        conversation = json.load(f)['conversation']
+    query_embedding = get_embeddings().embed_query(build_query(conversation))
+    timings['embed_query'] = time.perf_counter() - start_time
+
+    searches = {'public_data': get_public_store(game_name)}
+    if include_character_data:
+        searches['character_data'] = get_character_store(game_name, character_name)
+
+    with ThreadPoolExecutor(max_workers=len(searches)) as executor:
+        futures = {name: executor.submit(search_store, vectordb, query_embedding, k)
+                   for name, vectordb in searches.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    for name, (_, duration) in results.items():
+        timings[name] = duration
+
+    public_data_string = results['public_data'][0]
+    character_data_string = results['character_data'][0] if include_character_data else ''
+
+    return public_data_string, character_data_string, timings
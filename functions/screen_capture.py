@@ -0,0 +1,217 @@
+import sys
+import time
+import ctypes
+import ctypes.util
+import threading
+import cv2
+import numpy as np
+
+# Frames kept in the ring buffer, the capture thread never writes into the newest frame
+ring_buffer_size = 3
+
+# Upper limit of the capture rate, so the capture thread does not take a whole core
+max_capture_fps = 60
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p), ('readOnly', ctypes.c_int)]
+
+
+class XImage(ctypes.Structure):
+    _fields_ = [('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int),
+                ('format', ctypes.c_int), ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int), ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int),
+                ('depth', ctypes.c_int), ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int),
+                ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong), ('blue_mask', ctypes.c_ulong)]
+
+
+class X11ShmCapture:
+    # Copies the root window into one shared memory segment with the MIT-SHM extension, works under Xvfb
+
+    def __init__(self, region=None):
+        self.xlib = ctypes.cdll.LoadLibrary(ctypes.util.find_library('X11'))
+        self.xext = ctypes.cdll.LoadLibrary(ctypes.util.find_library('Xext'))
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        self.xlib.XDefaultVisual.restype = ctypes.c_void_p
+        self.xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        self.xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        self.xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                              ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+                                              ctypes.c_uint, ctypes.c_uint]
+        self.xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        self.xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        self.xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+                                           ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        self.libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        self.libc.shmat.restype = ctypes.c_void_p
+        self.libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        self.libc.shmdt.argtypes = [ctypes.c_void_p]
+        self.libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        self.display = self.xlib.XOpenDisplay(None)
+        if not self.display:
+            raise RuntimeError("Cannot open the X display, is DISPLAY set?")
+        if not self.xext.XShmQueryExtension(self.display):
+            raise RuntimeError("The X server does not support the MIT-SHM extension")
+
+        screen = self.xlib.XDefaultScreen(self.display)
+        self.root = self.xlib.XDefaultRootWindow(self.display)
+        if region:
+            self.left, self.top, right, bottom = region
+            self.width, self.height = right - self.left, bottom - self.top
+        else:
+            self.left, self.top = 0, 0
+            self.width = self.xlib.XDisplayWidth(self.display, screen)
+            self.height = self.xlib.XDisplayHeight(self.display, screen)
+
+        self.shminfo = XShmSegmentInfo()
+        self.image = self.xext.XShmCreateImage(self.display, self.xlib.XDefaultVisual(self.display, screen),
+                                               self.xlib.XDefaultDepth(self.display, screen), 2,  # ZPixmap
+                                               None, ctypes.byref(self.shminfo), self.width, self.height)
+        if self.image.contents.bits_per_pixel != 32:
+            raise RuntimeError("Only 32 bit X visuals are supported")
+
+        size = self.image.contents.bytes_per_line * self.height
+        self.shminfo.shmid = self.libc.shmget(0, size, 0o1000 | 0o600)  # IPC_PRIVATE, IPC_CREAT
+        if self.shminfo.shmid < 0:
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        self.shminfo.shmaddr = self.libc.shmat(self.shminfo.shmid, None, 0)
+        self.shminfo.readOnly = 0
+        self.image.contents.data = self.shminfo.shmaddr
+        self.xext.XShmAttach(self.display, ctypes.byref(self.shminfo))
+        self.xlib.XSync(self.display, 0)
+
+        # Remove the segment now, it stays alive until both sides have detached from it
+        self.libc.shmctl(self.shminfo.shmid, 0, None)  # IPC_RMID
+
+        # The shared memory seen as BGRA pixels, rows can be padded past width * 4 bytes
+        bytes_per_line = self.image.contents.bytes_per_line
+        buffer = (ctypes.c_uint8 * size).from_address(self.shminfo.shmaddr)
+        rows = np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, bytes_per_line)
+        self.pixels = rows[:, :self.width * 4].reshape(self.height, self.width, 4)
+
+    def grab(self, out):
+        # 0xFFFFFFFF is AllPlanes
+        self.xext.XShmGetImage(self.display, self.root, self.image, self.left, self.top, 0xFFFFFFFF)
+        cv2.cvtColor(self.pixels, cv2.COLOR_BGRA2BGR, dst=out)
+
+    def close(self):
+        self.xext.XShmDetach(self.display, ctypes.byref(self.shminfo))
+        self.libc.shmdt(self.shminfo.shmaddr)
+        self.xlib.XCloseDisplay(self.display)
+
+
+class Win32Capture:
+    # BitBlt into a bitmap that is created once and reused for every frame
+
+    def __init__(self, region=None):
+        import win32gui, win32ui, win32con, win32api
+        self.win32gui = win32gui
+        self.srccopy = win32con.SRCCOPY
+
+        if region:
+            self.left, self.top, right, bottom = region
+            self.width, self.height = right - self.left, bottom - self.top
+        else:
+            self.width = win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN)
+            self.height = win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN)
+            self.left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
+            self.top = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
+
+        self.hwin = win32gui.GetDesktopWindow()
+        self.hwindc = win32gui.GetWindowDC(self.hwin)
+        self.srcdc = win32ui.CreateDCFromHandle(self.hwindc)
+        self.memdc = self.srcdc.CreateCompatibleDC()
+        self.bmp = win32ui.CreateBitmap()
+        self.bmp.CreateCompatibleBitmap(self.srcdc, self.width, self.height)
+        self.memdc.SelectObject(self.bmp)
+
+    def grab(self, out):
+        self.memdc.BitBlt((0, 0), (self.width, self.height), self.srcdc, (self.left, self.top), self.srccopy)
+        pixels = np.frombuffer(self.bmp.GetBitmapBits(True), dtype=np.uint8).reshape(self.height, self.width, 4)
+        cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR, dst=out)
+
+    def close(self):
+        self.srcdc.DeleteDC()
+        self.memdc.DeleteDC()
+        self.win32gui.ReleaseDC(self.hwin, self.hwindc)
+        self.win32gui.DeleteObject(self.bmp.GetHandle())
+
+
+def create_backend(region=None):
+    if sys.platform == 'win32':
+        return Win32Capture(region)
+    return X11ShmCapture(region)
+
+
+class ScreenCapture:
+    # Captures on its own thread into a preallocated ring buffer, read() returns the newest frame right away
+
+    def __init__(self, region=None, buffer_size=None, max_fps=None, backend=None):
+        self.backend = backend if backend is not None else create_backend(region)
+        self.buffer_size = buffer_size or ring_buffer_size
+        self.frame_interval = 1 / (max_fps or max_capture_fps)
+        self.frames = np.zeros((self.buffer_size, self.backend.height, self.backend.width, 3), dtype=np.uint8)
+        self.latest_index = -1
+        self.frame_count = 0
+        self.frame_ready = threading.Event()
+        self.error = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def capture_loop(self):
+        try:
+            while self.running:
+                start_time = time.perf_counter()
+
+                # Write into the slot after the newest one, so a frame being read is not overwritten
+                index = (self.latest_index + 1) % self.buffer_size
+                self.backend.grab(self.frames[index])
+                self.latest_index = index
+                self.frame_count += 1
+                self.frame_ready.set()
+
+                remaining = self.frame_interval - (time.perf_counter() - start_time)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except Exception as e:
+            # Wake up read() so it raises instead of waiting for a frame that never comes
+            self.error = e
+            self.running = False
+            self.frame_ready.set()
+        finally:
+            self.backend.close()
+
+    def read(self, copy=True):
+        # Only the first read waits for a frame, after that the newest frame is returned immediately.
+        # Without copy the frame is only valid until the buffer wraps around. Raises once the capture thread failed
+        self.frame_ready.wait()
+        if self.error is not None:
+            raise RuntimeError("Screen capture failed") from self.error
+        frame = self.frames[self.latest_index]
+        return frame.copy() if copy else frame
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
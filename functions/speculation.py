@@ -0,0 +1,65 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functions.face_detection import extract_face
+from functions.find_character import find_character_with_lowest_cosine_score
+from functions.prompt_context_cache import read_text, read_json
+from functions.retrieval_service import get_public_store, get_character_store
+from functions.tts_engine import get_engine
+from functions.debug_dump import dump_image
+
+# One worker, so a speculation started by a new key press waits for the previous one
+executor = ThreadPoolExecutor(max_workers=1)
+
+
+class Speculation:
+    # Work started on the interact key press, main() picks up the results after transcription
+
+    def __init__(self, screen, future):
+        self.screen = screen
+        self.future = future
+        self.start_time = time.perf_counter()
+
+    def result(self):
+        if not self.future.done():
+            print(f"Waiting for speculation started {time.perf_counter() - self.start_time:.2f}s ago")
+        return self.future.result()
+
+
+def preload_character(game_name, character_name):
+    # Warm the caches the reply generation reads from for this character
+    character_path = f"{game_name}/characters/{character_name}"
+    read_text(f"{character_path}/bio.txt")
+    read_json(f"{character_path}/pre_conversation.json")
+    get_character_store(game_name, character_name)
+    if os.path.isfile(f"{character_path}/voice.txt") or os.path.isdir(f"{character_path}/voice"):
+        get_engine(game_name, character_name)
+
+
+def speculate(screen, game_name, characters, facial_animation_switch):
+    start_time = time.perf_counter()
+
+    read_text(f"{game_name}/world.txt")
+    get_public_store(game_name)
+
+    face, character_name = (None, ''), None
+    if facial_animation_switch:
+        # Extract and identify the face on the frame the player was looking at when they pressed the key
+        dump_image('screen', screen)
+        face = extract_face(screen)
+        dump_image('extracted_face', face[0])
+        if face[0] is not None:
+            character_name = find_character_with_lowest_cosine_score(
+                game_name, characters, face[0])
+            if character_name != 'NULL':
+                preload_character(game_name, character_name)
+
+    print(f"Speculation finished in {time.perf_counter() - start_time:.2f}s")
+    return {'face': face, 'character_name': character_name}
+
+
+def start_speculation(screen, game_name, characters, facial_animation_switch):
+    screen = screen.copy()
+    future = executor.submit(speculate, screen, game_name,
+                             characters, facial_animation_switch)
+    return Speculation(screen, future)
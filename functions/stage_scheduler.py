@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def run_stages(stages, max_workers=4):
+    # stages maps a stage name to (function, [names of the stages it depends on])
+    # Each function is called with the results of its dependencies, in the listed order,
+    # as soon as all of them have finished
+    results, start_times, end_times = {}, {}, {}
+    pending = dict(stages)
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # Submit every stage whose dependencies are done
+            for name, (function, dependencies) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    args = [results[dependency] for dependency in dependencies]
+                    start_times[name] = time.perf_counter() - start
+                    running[executor.submit(function, *args)] = name
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Stages with unmet dependencies: {list(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                end_times[name] = time.perf_counter() - start
+                results[name] = future.result()
+
+    timings = {name: end_times[name] - start_times[name] for name in stages}
+    critical_path, critical_path_time = find_critical_path(stages, end_times)
+
+    return results, timings, critical_path, critical_path_time
+
+
+def find_critical_path(stages, end_times):
+    # Walk back from the stage that finished last, always through the dependency that finished last
+    name = max(end_times, key=end_times.get)
+    critical_path = [name]
+    while stages[name][1]:
+        name = max(stages[name][1], key=end_times.get)
+        critical_path.insert(0, name)
+    return critical_path, max(end_times.values())
+
+
+def print_stage_report(timings, critical_path, critical_path_time):
+    for name, duration in timings.items():
+        print(f"{name}: {duration:.2f}s")
+    print(f"Critical path ({critical_path_time:.2f}s): {' -> '.join(critical_path)}")
+    print(f"Sum of all stages: {sum(timings.values()):.2f}s")
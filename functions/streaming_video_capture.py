@@ -0,0 +1,70 @@
+import time
+import queue
+import threading
+import cv2
+
+
+class StreamingVideoCapture:
+    # Drop-in for cv2.VideoCapture that plays frames from a generator while it is still producing them
+
+    def __init__(self, frames, fps=25, buffer_size=10, frame_count=None):
+        self.fps = fps
+        self.frame_count = frame_count
+        self.frame_queue = queue.Queue()
+        self.frames_produced = 0
+        self.first_frame_time = None
+        self.error = None
+
+        self.reader_thread = threading.Thread(
+            target=self.read_frames, args=(frames,), daemon=True)
+        self.reader_thread.start()
+
+        # Wait for a small buffer so playback does not stall on the first frames
+        while self.frame_queue.qsize() < buffer_size and self.reader_thread.is_alive():
+            self.reader_thread.join(timeout=0.01)
+
+        # When frames are rendered slower than they play, also wait until the rest of the clip
+        # will be rendered before playback reaches it
+        while self.frame_count and self.reader_thread.is_alive() and self.render_would_stall():
+            self.reader_thread.join(timeout=0.01)
+
+    def read_frames(self, frames):
+        try:
+            for frame in frames:
+                if self.first_frame_time is None:
+                    self.first_frame_time = time.perf_counter()
+                self.frame_queue.put(frame)
+                self.frames_produced += 1
+        except Exception as e:
+            print(e)
+            self.error = e
+        finally:
+            # None marks the end of the clip
+            self.frame_queue.put(None)
+
+    def render_would_stall(self):
+        # Measured from the first frame on, the first chunk also pays for the preprocessing
+        if self.frames_produced < 2:
+            return True
+        render_rate = (self.frames_produced - 1) / (time.perf_counter() - self.first_frame_time)
+        remaining_render_time = (self.frame_count - self.frames_produced) / render_rate
+        return remaining_render_time > self.frame_count / self.fps
+
+    def read(self):
+        frame = self.frame_queue.get()
+        if frame is None:
+            # Keep the end marker for any later read
+            self.frame_queue.put(None)
+            return False, None
+        return True, frame
+
+    def get(self, prop_id):
+        # Only the frame rate and the expected frame count are known for a stream, 0 like cv2.VideoCapture otherwise
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT and self.frame_count:
+            return self.frame_count
+        return 0
+
+    def release(self):
+        pass
@@ -1,20 +1,110 @@
-import cohere
+import os
+import sys
+import glob
 import json
-import random
+import math
+import urllib.request
+from functools import lru_cache
 
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
 
-def token_len(input):
+# Cohere command tokenizer in the Hugging Face tokenizer.json format, it is not shipped with the repo.
+# Run `python -m functions.token_length --download` once, it asks the Cohere API for the model's
+# tokenizer_url (needs cohere>=5 and a key in apikeys.json) and saves the file here
+tokenizer_path = 'cohere_tokenizer.json'
+tokenizer_model = 'command'
+
+# Characters per token measured on this repo's texts by `python -m functions.token_length --calibrate`
+calibration_path = 'token_calibration.json'
+
+# Used when there is neither a tokenizer file nor a calibration, the common rule of thumb for English
+# text, not measured on this repo's texts
+default_chars_per_token = 4.0
+
+tokenizer = None
+chars_per_token = None
+
+
+def load_tokenizer():
+    global tokenizer
+    if tokenizer is None and Tokenizer is not None and os.path.isfile(tokenizer_path):
+        tokenizer = Tokenizer.from_file(tokenizer_path)
+    return tokenizer
+
+
+def load_chars_per_token():
+    global chars_per_token
+    if chars_per_token is None:
+        if os.path.isfile(calibration_path):
+            with open(calibration_path, 'r') as f:
+                chars_per_token = json.load(f)['chars_per_token']
+        else:
+            chars_per_token = default_chars_per_token
+            print(f"No {tokenizer_path} or {calibration_path}, estimating tokens at an uncalibrated "
+                  f"{chars_per_token} characters per token, see functions/token_length.py")
+    return chars_per_token
+
+
+@lru_cache(maxsize=4096)
+def cached_token_len(input):
+    local_tokenizer = load_tokenizer()
+    if local_tokenizer is not None:
+        return len(local_tokenizer.encode(input, add_special_tokens=False).ids)
+
+    # Estimate from the length of the text
+    return max(1, math.ceil(len(input) / load_chars_per_token()))
 
-    # Randomly select an API key
-    selected_key = json.load(open('apikeys.json', 'r'))['api_keys'][random.randint(
-        0, len(json.load(open('apikeys.json', 'r'))['api_keys'])-1)]
-    co = cohere.Client(selected_key)
 
+def token_len(input):
     if input.replace(" ", "") == "":
         return 0
 
-    response = co.tokenize(
-        text=input,
-        model='command'
-    )
-    return len(response.tokens)
+    return cached_token_len(input)
+
+
+def download_tokenizer():
+    from functions.client_registry import call_client
+    tokenizer_url = call_client(lambda client: client.models.get(tokenizer_model).tokenizer_url)
+    urllib.request.urlretrieve(tokenizer_url, tokenizer_path)
+    print(f"Saved the {tokenizer_model} tokenizer to {tokenizer_path}")
+
+
+def calibration_texts():
+    # The texts token_len is used on, world descriptions, bios and conversation lines of every game
+    texts = []
+    for path in glob.glob('*/world.txt') + glob.glob('*/characters/*/bio.txt'):
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+    for path in glob.glob('*/characters/*/conversation.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            texts += [f"{line['sender']}: {line['message']}\n" for line in json.load(f)['conversation']]
+    return [text for text in texts if text.strip()]
+
+
+def count_tokens(text):
+    # The real token count, from the tokenizer file or else from the Cohere tokenize endpoint
+    local_tokenizer = load_tokenizer()
+    if local_tokenizer is not None:
+        return len(local_tokenizer.encode(text, add_special_tokens=False).ids)
+    from functions.client_registry import call_client
+    return len(call_client(lambda client: client.tokenize(text=text, model=tokenizer_model).tokens))
+
+
+def calibrate():
+    texts = calibration_texts()
+    characters = sum(len(text) for text in texts)
+    tokens = sum(count_tokens(text) for text in texts)
+    ratio = round(characters / tokens, 3)
+    with open(calibration_path, 'w') as f:
+        json.dump({'chars_per_token': ratio, 'texts': len(texts), 'characters': characters, 'tokens': tokens}, f, indent=2)
+    print(f"{characters} characters in {len(texts)} texts are {tokens} tokens, {ratio} characters per token")
+
+
+if __name__ == '__main__':
+    if '--download' in sys.argv:
+        download_tokenizer()
+    if '--calibrate' in sys.argv:
+        calibrate()
@@ -0,0 +1,205 @@
+import os
+import wave
+import zlib
+import asyncio
+import tempfile
+import threading
+import subprocess
+import importlib.util
+import numpy as np
+from pydub.utils import get_encoder_name
+
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
+
+# Backend used for every character voice, 'edge' or 'offline'
+tts_backend = 'edge'
+
+# Voice used when a character has neither a voice.py nor a voice.txt
+default_voice = 'en-US-EricNeural'
+
+# Sample rate of the PCM chunks, edge-tts streams 24kHz mono
+sample_rate = 24000
+
+# Most bytes of PCM read from the decoder at once, 0.1s at 24kHz
+edge_read_bytes = 4800
+
+# (game_name, character_name) -> (backend or None, voice) read from the character's files
+voices = {}
+
+# voice.py path -> the loaded module
+voice_scripts = {}
+
+# (backend, voice) -> loaded engine
+engines = {}
+
+
+class TTSEngine:
+    # A voice loaded once, stream() yields int16 mono PCM chunks while the text is synthesized
+
+    def __init__(self, voice):
+        self.voice = voice
+        self.sample_rate = sample_rate
+
+    def stream(self, text):
+        raise NotImplementedError
+
+    def synthesize(self, text, path):
+        # Write every chunk to a wav file as it arrives
+        with wave.open(path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            for chunk in self.stream(text):
+                f.writeframes(chunk.tobytes())
+        return path
+
+
+class EdgeTTSEngine(TTSEngine):
+
+    def __init__(self, voice):
+        if edge_tts is None:
+            raise ImportError("edge-tts is not installed, use the 'offline' backend instead")
+        super().__init__(voice)
+
+    async def receive_mp3(self, text, decoder):
+        async for message in edge_tts.Communicate(text, self.voice).stream():
+            if message['type'] == 'audio':
+                decoder.stdin.write(message['data'])
+                decoder.stdin.flush()
+
+    def run_communicate(self, text, decoder, errors):
+        # edge-tts is async, run it on its own event loop so stream() stays a plain generator
+        try:
+            asyncio.run(self.receive_mp3(text, decoder))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            decoder.stdin.close()
+
+    def open_decoder(self):
+        # One ffmpeg process per utterance decodes the mp3 as it arrives, every byte is decoded once
+        command = [get_encoder_name(), '-loglevel', 'error', '-probesize', '32', '-analyzeduration', '0',
+                   '-fflags', 'nobuffer', '-f', 'mp3', '-i', 'pipe:0',
+                   '-f', 's16le', '-ac', '1', '-ar', str(self.sample_rate), 'pipe:1']
+        return subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def stream(self, text):
+        decoder = self.open_decoder()
+        errors = []
+        threading.Thread(target=self.run_communicate, args=(text, decoder, errors), daemon=True).start()
+
+        try:
+            # Samples are yielded as soon as ffmpeg outputs them, an odd byte waits for its other half
+            pending = b''
+            while True:
+                data = decoder.stdout.read1(edge_read_bytes)
+                if not data:
+                    break
+                pending += data
+                usable = len(pending) - len(pending) % 2
+                if usable:
+                    yield np.frombuffer(pending[:usable], dtype=np.int16)
+                    pending = pending[usable:]
+        finally:
+            decoder.stdout.close()
+            decoder.wait()
+
+        if errors:
+            raise errors[0]
+
+
+class OfflineToneEngine(TTSEngine):
+    # Deterministic local synthesizer for benchmarking without the network, one tone per word
+
+    seconds_per_character = 0.06
+    pause_seconds = 0.05
+
+    def stream(self, text):
+        voice_seed = zlib.crc32(self.voice.encode())
+        pause = np.zeros(int(self.pause_seconds * self.sample_rate), dtype=np.int16)
+        for word in text.split():
+            frequency = 110 + (zlib.crc32(word.encode()) ^ voice_seed) % 330
+            t = np.arange(int(len(word) * self.seconds_per_character * self.sample_rate)) / self.sample_rate
+            envelope = np.minimum(1, np.minimum(t, t[-1] - t) * 50)
+            tone = 0.3 * envelope * np.sin(2 * np.pi * frequency * t)
+            yield np.concatenate([(tone * 32767).astype(np.int16), pause])
+
+
+class ScriptTTSEngine(TTSEngine):
+    # A character's own voice.py without a VOICE, e.g. voice cloning. create_speech writes a whole
+    # file per call, it is decoded to PCM afterwards, the voice is the path of the voice.py
+
+    def __init__(self, voice):
+        super().__init__(voice)
+        self.create_speech = load_voice_script(voice).create_speech
+
+    def stream(self, text):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'speech.mp3')
+            self.create_speech(text, path)
+            command = [get_encoder_name(), '-loglevel', 'error', '-i', path,
+                       '-f', 's16le', '-ac', '1', '-ar', str(self.sample_rate), 'pipe:1']
+            pcm = np.frombuffer(subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout, dtype=np.int16)
+
+        # Same chunk size as the edge backend so playback starts at the same pace
+        for start in range(0, len(pcm), edge_read_bytes // 2):
+            yield pcm[start:start + edge_read_bytes // 2]
+
+
+backends = {'edge': EdgeTTSEngine, 'offline': OfflineToneEngine, 'script': ScriptTTSEngine}
+
+
+def load_voice(game_name, character_name):
+    if (game_name, character_name) not in voices:
+        voices[(game_name, character_name)] = read_voice(game_name, character_name)
+    return voices[(game_name, character_name)]
+
+
+def load_voice_script(voice_script_path):
+    # Load the voice.py without going through the package path,
+    # game folders like God_of_War_(2018) are not importable module names
+    if voice_script_path not in voice_scripts:
+        module_name = voice_script_path.replace('/', '_').replace('.', '_')
+        spec = importlib.util.spec_from_file_location(module_name, voice_script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        voice_scripts[voice_script_path] = module
+    return voice_scripts[voice_script_path]
+
+
+def read_voice(game_name, character_name):
+    # A voice.py with a VOICE constant is spoken by the edge backend, one without it is a custom
+    # voice, e.g. voice cloning, and is spoken by its own create_speech
+    voice_script_path = f'{game_name}/characters/{character_name}/voice/voice.py'
+    if os.path.isfile(voice_script_path):
+        module = load_voice_script(voice_script_path)
+        if getattr(module, 'VOICE', None):
+            return None, module.VOICE
+        if hasattr(module, 'create_speech'):
+            return 'script', voice_script_path
+
+    voice_path = f'{game_name}/characters/{character_name}/voice.txt'
+    if os.path.isfile(voice_path):
+        return None, open(voice_path).read().strip()
+
+    return None, default_voice
+
+
+def get_engine(game_name, character_name, voice=None, backend=None):
+    # voice overrides the character's own, e.g. for the default character whose voice changes with its personality
+    if backend is None:
+        backend = tts_backend
+    if voice is None:
+        voice_backend, voice = load_voice(game_name, character_name)
+        # The offline backend stays offline for benchmarks, a custom voice.py may need the network or a GPU
+        if voice_backend is not None and backend != 'offline':
+            backend = voice_backend
+    voice = voice.strip()
+
+    engine_key = (backend, voice)
+    if engine_key not in engines:
+        engines[engine_key] = backends[backend](voice)
+    return engines[engine_key]
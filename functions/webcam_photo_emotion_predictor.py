@@ -1,30 +1,12 @@
-import cv2
-import os
-from functions.get_emotion import get_emotion
+from functions.webcam_service import webcam_service
 
 
 def webcam_photo_emotion_predictor():
-    # Open the webcam
-    cap = cv2.VideoCapture(0)
+    # The webcam service samples the player's face in the background, its current estimate is returned
+    # right away. It is started here if the notebook did not start it already
+    webcam_service.start()
 
-    # Capture photo
-    ret, frame = cap.read()
-
-    # Release the webcam
-    cap.release()
-
-    # Save the photo
-    photo_path = "temp/webcam_photo.jpg"
-    cv2.imwrite(photo_path, frame)
-
-    try:
-        # Get emotion from the photo
-        emotion = get_emotion(photo_path)
-    except Exception as e:
-        print(e)
-        return 'neutral'
-
-    # Delete the photo
-    os.remove(photo_path)
+    emotion = webcam_service.current_emotion()
+    print("Player emotion", emotion)
 
     return emotion
@@ -0,0 +1,93 @@
+import time
+import threading
+import cv2
+from functions.face_analysis import analyze_face
+
+# Seconds between two webcam samples
+sample_interval = 1.0
+
+# Weight of the newest sample in the smoothed emotion scores
+ema_alpha = 0.3
+
+# Emotion used until the first face has been seen
+default_emotion = 'neutral'
+
+
+class WebcamEmotionService:
+    # Keeps the webcam open and updates a smoothed estimate of the player's emotion in the background
+
+    def __init__(self, camera_index=0):
+        self.camera_index = camera_index
+        self.scores = None
+        self.last_update = None
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        # Failures already printed, the loop keeps sampling so each kind is only printed once
+        self.reported = set()
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self.sample_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def update(self, scores):
+        with self.lock:
+            if self.scores is None:
+                self.scores = dict(scores)
+            else:
+                for emotion, score in scores.items():
+                    self.scores[emotion] = ema_alpha * score + (1 - ema_alpha) * self.scores.get(emotion, 0)
+            self.last_update = time.time()
+
+    def report(self, kind, message):
+        if kind not in self.reported:
+            self.reported.add(kind)
+            print(message)
+
+    def sample_loop(self):
+        # The camera is opened once, not for every reply
+        cap = cv2.VideoCapture(self.camera_index)
+        try:
+            while self.running:
+                start_time = time.perf_counter()
+                ret, frame = cap.read()
+                if ret:
+                    try:
+                        scores = analyze_face(frame, ['emotion_scores'], cache=False)['emotion_scores']
+                        self.update(scores)
+                    except ValueError:
+                        # No face in this sample, keep the current estimate
+                        pass
+                    except Exception as e:
+                        self.report('analysis', f"Webcam emotion analysis failed, the emotion stays {self.current_emotion()}: {e}")
+                else:
+                    self.report('camera', f"Cannot read from webcam {self.camera_index}, the emotion stays {self.current_emotion()}")
+
+                remaining = sample_interval - (time.perf_counter() - start_time)
+                if remaining > 0:
+                    time.sleep(remaining)
+        finally:
+            cap.release()
+
+    def current_emotion(self):
+        with self.lock:
+            if self.scores is None:
+                return default_emotion
+            return max(self.scores, key=self.scores.get)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+webcam_service = WebcamEmotionService()
+
+
+def start_webcam_service():
+    return webcam_service.start()